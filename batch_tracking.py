@@ -0,0 +1,189 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import object_boxing_offset as tracker
+import table_io
+
+# === Settings ===
+# Either a directory of videos (tracked with the thresholds/offsets from
+# object_boxing_offset.py) or a manifest CSV with one row per video:
+#   video,lower_h,lower_s,lower_v,upper_h,upper_s,upper_v,erode_iter,left_off,right_off
+# Empty or missing columns fall back to the tracker defaults; relative video
+# paths are resolved against the manifest's directory. The remaining detection
+# settings (ROI, pyramid, mask engine, kernel) always come from the tracker
+# and are part of the params stamp too. Outputs are named after the video
+# stem, so two videos with the same stem are rejected.
+INPUT      = 'videos'
+OUTPUT_DIR = 'tracking_out'
+
+VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# one video per process (each video is tracked sequentially and headless)
+N_WORKERS = os.cpu_count() or 1
+
+
+def default_params():
+    return {
+        'lower_green': tracker.lower_green.tolist(),
+        'upper_green': tracker.upper_green.tolist(),
+        'erode_iter':  tracker.erode_iter,
+        'left_off':    tracker.LEFT_OFFSET_PX,
+        'right_off':   tracker.RIGHT_OFFSET_PX,
+        'roi_tracking':  tracker.ROI_TRACKING,
+        'roi_pad':       tracker.ROI_PAD_PX,
+        'pyramid_scale': tracker.PYRAMID_SCALE,
+        'mask_engine':   tracker.MASK_ENGINE,
+        'lut_bins':      tracker.LUT_BINS,
+        'lut_blur_mask': tracker.LUT_BLUR_MASK,
+        'kernel':        tracker.kernel.tolist(),
+    }
+
+
+def load_jobs(source):
+    """List of (video_path, params) from a directory or a manifest CSV."""
+    if os.path.isdir(source):
+        videos = sorted(f for f in os.listdir(source) if f.lower().endswith(VIDEO_EXTS))
+        jobs = [(os.path.join(source, f), default_params()) for f in videos]
+        check_stems(jobs)
+        return jobs
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    jobs = []
+    with open(source, newline='') as f:
+        for row in csv.DictReader(f):
+            row = {k.strip(): (v or '').strip() for k, v in row.items() if k}
+            if not row.get('video'):
+                continue
+
+            params = default_params()
+            for i, ch in enumerate('hsv'):
+                if row.get(f'lower_{ch}'):
+                    params['lower_green'][i] = int(row[f'lower_{ch}'])
+                if row.get(f'upper_{ch}'):
+                    params['upper_green'][i] = int(row[f'upper_{ch}'])
+            for key in ('erode_iter', 'left_off', 'right_off'):
+                if row.get(key):
+                    params[key] = int(row[key])
+
+            jobs.append((os.path.join(base_dir, row['video']), params))
+    check_stems(jobs)
+    return jobs
+
+
+def check_stems(jobs):
+    """Raise ValueError if two videos would write the same output files."""
+    seen = {}
+    for video, _ in jobs:
+        stem = os.path.splitext(os.path.basename(video))[0]
+        if stem in seen:
+            raise ValueError(f"{seen[stem]} and {video} share the output stem '{stem}'")
+        seen[stem] = video
+
+
+def output_paths(video):
+    """Output files of one video; the params stamp is always the last entry."""
+    stem = os.path.splitext(os.path.basename(video))[0]
+    paths = {
+        'green':    os.path.join(OUTPUT_DIR, f'{stem}_green.csv'),
+        'yellow':   os.path.join(OUTPUT_DIR, f'{stem}_yellow.csv'),
+    }
+    if table_io.WRITE_BINARY:
+        paths['green_npy']  = table_io.binary_path(paths['green'])
+        paths['yellow_npy'] = table_io.binary_path(paths['yellow'])
+    paths['geometry'] = os.path.join(OUTPUT_DIR, f'{stem}_geometry.npy')
+    paths['stamp']    = os.path.join(OUTPUT_DIR, f'{stem}_params.json')
+    return paths
+
+
+def is_up_to_date(video, params):
+    """Outputs exist, are newer than the video and were made with the same params."""
+    paths = output_paths(video)
+    if not all(os.path.exists(p) for p in paths.values()):
+        return False
+
+    video_mtime = os.path.getmtime(video)
+    if any(os.path.getmtime(p) < video_mtime for p in paths.values()):
+        return False
+
+    with open(paths['stamp']) as f:
+        try:
+            return json.load(f) == params
+        except ValueError:
+            return False
+
+
+def track_video(video, params):
+    """Worker: track one video and write its outputs atomically."""
+    tracker.video_path      = video
+    tracker.lower_green     = np.array(params['lower_green'])
+    tracker.upper_green     = np.array(params['upper_green'])
+    tracker.erode_iter      = params['erode_iter']
+    tracker.LEFT_OFFSET_PX  = params['left_off']
+    tracker.RIGHT_OFFSET_PX = params['right_off']
+    tracker.ROI_TRACKING    = params['roi_tracking']
+    tracker.ROI_PAD_PX      = params['roi_pad']
+    tracker.PYRAMID_SCALE   = params['pyramid_scale']
+    tracker.MASK_ENGINE     = params['mask_engine']
+    tracker.LUT_BINS        = params['lut_bins']
+    tracker.LUT_BLUR_MASK   = params['lut_blur_mask']
+    tracker.kernel          = np.array(params['kernel'], np.uint8)
+
+    # one core per video, no windows
+    tracker.HEADLESS       = True
+    tracker.PARALLEL       = False
+    tracker.PIPELINED      = False
+    tracker.ADAPTIVE       = False
+    tracker.FROM_GEOMETRY  = False
+    tracker.save_snapshots = False
+    tracker.save_video     = False
+
+    paths = output_paths(video)
+    tmp = {k: p + '.tmp' for k, p in paths.items()}
+
+    t_start = time.perf_counter()
+    geom = tracker.track_to_csv(tmp['green'], tmp['yellow'])
+    elapsed = time.perf_counter() - t_start
+
+    with open(tmp['geometry'], 'wb') as f:
+        np.save(f, geom)
+    if table_io.WRITE_BINARY:
+        with open(tmp['green_npy'], 'wb') as f_green, open(tmp['yellow_npy'], 'wb') as f_yellow:
+            tracker.save_binary_tables(geom, f_green, f_yellow)
+    with open(tmp['stamp'], 'w') as f:
+        json.dump(params, f)
+
+    # data first, stamp last: a crash in between leaves the video "not done"
+    for key in paths:
+        os.replace(tmp[key], paths[key])
+
+    return len(geom), elapsed
+
+
+if __name__ == '__main__':
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    jobs = load_jobs(INPUT)
+    todo = [(v, p) for v, p in jobs if not is_up_to_date(v, p)]
+
+    print(f"{len(jobs)} videos, {len(jobs) - len(todo)} up to date, {len(todo)} to track")
+
+    n_failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(N_WORKERS, len(todo) or 1))) as pool:
+        futures = {pool.submit(track_video, v, p): v for v, p in todo}
+        for fut in as_completed(futures):
+            video = futures[fut]
+            try:
+                n_frames, elapsed = fut.result()
+            except Exception as e:
+                n_failed += 1
+                print(f"FAILED {video}: {e}")
+                continue
+            fps = n_frames / elapsed if elapsed > 0 else 0.0
+            print(f"done   {video}: {n_frames} frames in {elapsed:.1f} s ({fps:.1f} frames/s)")
+
+    print(f"Batch finished, {n_failed} failed. Outputs in {OUTPUT_DIR}/")
@@ -0,0 +1,157 @@
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+import object_boxing_offset as tracker
+
+# === Settings ===
+# Synthetic recordings: a colored specimen rectangle that compresses and
+# extends cyclically. Rendered once into BENCH_DIR (with the ground-truth
+# length per frame) and reused by later runs.
+BENCH_DIR   = 'bench_videos'
+RESULTS_CSV = 'bench_results.csv'   # one row per scenario/mode, appended
+
+FPS          = 30.25
+CYCLE_FRAMES = 90       # frames per compression cycle
+COMPRESSION  = 0.25     # max relative length change
+SPECIMEN_BGR = (40, 200, 30)   # inside the tracker's default HSV bounds
+BACKGROUND   = (90, 90, 90)
+
+SCENARIOS = [
+    # name, (width, height), rotation [deg], noise sigma, frames
+    {'name': '720p',         'size': (1280, 720),  'angle': 0.0, 'noise': 4.0, 'frames': 600},
+    {'name': '1080p_rot5',   'size': (1920, 1080), 'angle': 5.0, 'noise': 8.0, 'frames': 600},
+    {'name': '4k_rot2',      'size': (3840, 2160), 'angle': 2.0, 'noise': 6.0, 'frames': 200},
+]
+
+# tracker settings to compare (overrides on object_boxing_offset globals)
+MODES = {
+    'baseline': {},
+    'roi':      {'ROI_TRACKING': True},
+    'pyramid2': {'PYRAMID_SCALE': 2, 'PYRAMID_VALIDATE_FRAMES': 0},
+    'lut':      {'MASK_ENGINE': 'lut', 'LUT_VALIDATE_FRAMES': 0},
+}
+
+
+def scenario_paths(sc):
+    stem = os.path.join(BENCH_DIR, sc['name'])
+    return stem + '.mp4', stem + '_truth.npy'
+
+
+def render_scenario(sc):
+    """Write the synthetic video and its ground-truth lengths (px per frame)."""
+    video, truth = scenario_paths(sc)
+    w, h = sc['size']
+    rng = np.random.default_rng(0)
+
+    length0   = 0.6 * w
+    thickness = 0.12 * h
+    frames = np.arange(sc['frames'])
+    phase = 0.5 - 0.5 * np.cos(2 * np.pi * frames / CYCLE_FRAMES)
+    lengths = length0 * (1.0 - COMPRESSION * phase)
+
+    out = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (w, h))
+    for i, length in enumerate(lengths):
+        frame = np.empty((h, w, 3), np.uint8)
+        frame[:] = BACKGROUND
+
+        # slow drift of the specimen, like the rig moving slightly
+        center = (w / 2 + 0.02 * w * np.sin(i / 200), h / 2 + 0.01 * h * np.cos(i / 150))
+        box = cv2.boxPoints((center, (length, thickness), sc['angle']))
+        # 4 fractional bits -> sub-pixel accurate edges
+        cv2.fillPoly(frame, [np.round(box * 16).astype(np.int32)], SPECIMEN_BGR, shift=4)
+
+        if sc['noise'] > 0:
+            noise = rng.normal(0.0, sc['noise'], frame.shape)
+            frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        out.write(frame)
+    out.release()
+
+    np.save(truth, lengths)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (nan if unavailable)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return float('nan')
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def run_benchmark(video, truth_path, overrides):
+    """Worker (fresh process per run): track `video`, return speed/memory/error."""
+    tracker.video_path     = video
+    tracker.HEADLESS       = True
+    tracker.save_snapshots = False
+    tracker.save_video     = False
+    tracker.TIMING         = False
+    for name, value in overrides.items():
+        setattr(tracker, name, value)
+
+    with open(os.devnull, 'w', newline='') as sink:
+        writer = csv.writer(sink)
+        t_start = time.perf_counter()
+        geom = tracker.run_sequential(writer, writer)
+        elapsed = time.perf_counter() - t_start
+
+    truth = np.load(truth_path)[:len(geom)]
+    sizes = tracker.boxes_from_geometry(geom)
+    err = sizes['height_green'][:len(truth)] - truth
+    found = geom['found'][:len(truth)]
+
+    return {
+        'frames':     len(geom),
+        'fps':        len(geom) / elapsed if elapsed > 0 else 0.0,
+        'peak_mb':    peak_rss_mb(),
+        'found_pct':  found.mean() * 100 if len(found) else 0.0,
+        'bias_px':    err[found].mean() if found.any() else float('nan'),
+        'mae_px':     np.abs(err[found]).mean() if found.any() else float('nan'),
+        'max_err_px': np.abs(err[found]).max() if found.any() else float('nan'),
+    }
+
+
+if __name__ == '__main__':
+    os.makedirs(BENCH_DIR, exist_ok=True)
+
+    for sc in SCENARIOS:
+        video, truth = scenario_paths(sc)
+        if not (os.path.exists(video) and os.path.exists(truth)):
+            print(f"Rendering {video} ...")
+            render_scenario(sc)
+
+    results = []
+    for sc in SCENARIOS:
+        video, truth = scenario_paths(sc)
+        for mode, overrides in MODES.items():
+            # fresh process so peak memory belongs to this run only
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                r = pool.submit(run_benchmark, video, truth, overrides).result()
+            r.update({'scenario': sc['name'], 'mode': mode})
+            results.append(r)
+            print(f"{sc['name']:12s} {mode:10s} {r['fps']:8.1f} fps  {r['peak_mb']:7.1f} MB  "
+                  f"found {r['found_pct']:5.1f}%  bias {r['bias_px']:+6.2f} px  "
+                  f"MAE {r['mae_px']:5.2f} px  max {r['max_err_px']:5.2f} px")
+
+    columns = ['timestamp', 'scenario', 'mode', 'frames', 'fps', 'peak_mb',
+               'found_pct', 'bias_px', 'mae_px', 'max_err_px']
+    new_file = not os.path.exists(RESULTS_CSV)
+    stamp = time.strftime('%Y-%m-%d %H:%M:%S')
+    with open(RESULTS_CSV, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(columns)
+        for r in results:
+            writer.writerow([stamp] + [r[c] if isinstance(r[c], str) else f'{r[c]:.3f}'
+                                       for c in columns[1:]])
+    print(f"Results appended to {RESULTS_CSV}")
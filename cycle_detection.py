@@ -0,0 +1,101 @@
+import numpy as np
+
+from table_io import SCHEMAS
+
+# Online cycle segmentation with the semantics of get_cycle_starts() /
+# find_cycle_peaks_pressure() in pressure-compression-plot.py:
+#  - a cycle starts where the pressure rises out of p < low_thresh_p,
+#    unless the previous start is less than min_spacing_s ago
+#  - it ends where the next cycle starts (or at the end of the data)
+#  - it is reported only if max - min pressure >= amp_min_p
+# Samples are fed one by one or in blocks; only the running min/max of the
+# open cycle is kept, so memory stays constant on arbitrarily long runs.
+# The peak is the first sample at the cycle's maximum pressure.
+
+CYCLE_DTYPE = np.dtype(SCHEMAS['pressure_cycles'])
+
+
+class CycleDetector:
+    """Incremental cycle detector; update*() return the cycles closed so far."""
+
+    def __init__(self, low_thresh_p, amp_min_p, min_spacing_s):
+        self.low_thresh_p = low_thresh_p
+        self.amp_min_p = amp_min_p
+        self.min_spacing_s = min_spacing_s
+
+        self.in_low = None          # was the last sample below low_thresh_p?
+        self.last_start = -np.inf   # time of the last accepted start
+        self.open_start = None      # start time of the cycle being measured
+        self.p_min = np.inf
+        self.p_max = -np.inf
+        self.t_peak = np.nan
+        self.t_last = None
+        self.n_cycles = 0
+
+    def update(self, t, p):
+        """Feed one sample (time in s, pressure in kPa)."""
+        return self.update_block([t], [p])
+
+    def update_block(self, t, p):
+        """Feed a block of samples; returns a list of CYCLE_DTYPE tuples."""
+        t = np.asarray(t, dtype=float)
+        p = np.asarray(p, dtype=float)
+        if len(p) == 0:
+            return []
+
+        below = p < self.low_thresh_p
+        prev_below = np.empty_like(below)
+        prev_below[1:] = below[:-1]
+        # the very first sample can't start a cycle
+        prev_below[0] = below[0] if self.in_low is None else self.in_low
+        self.in_low = bool(below[-1])
+
+        closed = []
+        seg_from = 0
+        for i in np.flatnonzero(prev_below & ~below).tolist():
+            # enforce minimum spacing in time between starts
+            if t[i] - self.last_start < self.min_spacing_s:
+                continue
+            self._accumulate(t[seg_from:i], p[seg_from:i])
+            closed += self._close(t[i])
+            self.open_start = self.last_start = t[i]
+            seg_from = i
+
+        self._accumulate(t[seg_from:], p[seg_from:])
+        self.t_last = t[-1]
+        return closed
+
+    def close(self):
+        """End of data: report the open cycle (if it qualifies)."""
+        if self.t_last is None:
+            return []
+        return self._close(self.t_last)
+
+    def _accumulate(self, t, p):
+        # samples before the first start belong to no cycle
+        if self.open_start is None or len(p) == 0:
+            return
+        k = int(np.argmax(p))
+        if p[k] > self.p_max:
+            self.p_max = p[k]
+            self.t_peak = t[k]
+        self.p_min = min(self.p_min, p.min())
+
+    def _close(self, t_end):
+        closed = []
+        if self.open_start is not None and self.p_max - self.p_min >= self.amp_min_p:
+            closed.append((self.n_cycles, self.open_start, t_end,
+                           self.p_min, self.p_max, self.t_peak))
+            self.n_cycles += 1
+        self.open_start = None
+        self.p_min = np.inf
+        self.p_max = -np.inf
+        self.t_peak = np.nan
+        return closed
+
+
+def detect_cycles(time, pressure, low_thresh_p, amp_min_p, min_spacing_s):
+    """Offline convenience: all cycles of a complete series as a CYCLE_DTYPE array."""
+    detector = CycleDetector(low_thresh_p, amp_min_p, min_spacing_s)
+    cycles = detector.update_block(time, pressure) + detector.close()
+    return np.array(cycles, dtype=CYCLE_DTYPE)
@@ -48,6 +48,31 @@ State state = HOLD;
 // ---- Flags ----
 bool testRunning = false;
 
+// ---- Telemetry format ----
+// ASCII lines (default) or packed binary frames; 'b' switches to binary,
+// 'a' back to ASCII. Info messages stay text, the host decoder skips them.
+bool binaryTelemetry = false;
+const unsigned long PRINT_INTERVAL_MS     = 150;
+const unsigned long BIN_PRINT_INTERVAL_MS = 20;   // 31-byte frames -> ~50 Hz
+const uint16_t      FRAME_SYNC            = 0xA55A;
+uint16_t frameSeq = 0;
+
+// Little-endian, no padding; must match FRAME_DTYPE in log_pressure_delay.py
+struct __attribute__((packed)) TelemetryFrame {
+  uint16_t sync;
+  uint16_t seq;
+  uint32_t millisMs;
+  float    P;
+  float    P_low;
+  float    P_high;
+  int32_t  posSteps;
+  uint8_t  state;     // 0 HOLD, 1 GOING_UP, 2 GOING_DOWN
+  uint8_t  stage;
+  uint16_t cycles;
+  uint8_t  running;
+  uint16_t crc;       // CRC-16/CCITT-FALSE over seq..running
+};
+
 
 // ============================================================================
 // Pressure read helper
@@ -71,6 +96,38 @@ float readPressure_kPa() {
 }
 
 
+// ============================================================================
+// Binary telemetry
+// ============================================================================
+uint16_t crc16_ccitt(const uint8_t *data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  while (len--) {
+    crc ^= (uint16_t)(*data++) << 8;
+    for (uint8_t i = 0; i < 8; i++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+    }
+  }
+  return crc;
+}
+
+void sendBinaryFrame(float P, long posSteps, unsigned long nowMs) {
+  TelemetryFrame f;
+  f.sync     = FRAME_SYNC;
+  f.seq      = frameSeq++;
+  f.millisMs = nowMs;
+  f.P        = P;
+  f.P_low    = P_low;
+  f.P_high   = P_high;
+  f.posSteps = posSteps;
+  f.state    = (uint8_t)state;
+  f.stage    = (uint8_t)stageIndex;
+  f.cycles   = (uint16_t)cycleCount;
+  f.running  = testRunning ? 1 : 0;
+  f.crc      = crc16_ccitt((const uint8_t *)&f + 2, sizeof(f) - 4);
+  Serial.write((const uint8_t *)&f, sizeof(f));
+}
+
+
 // ============================================================================
 // Update P_low, P_high for current stage
 // ============================================================================
@@ -174,6 +231,10 @@ void loop() {
       stepper.setSpeed(0);
       state = HOLD;
       Serial.println(F("Test stopped."));
+    } else if (c == 'b' || c == 'B') {
+      binaryTelemetry = true;
+    } else if (c == 'a' || c == 'A') {
+      binaryTelemetry = false;
     }
   }
 
@@ -235,24 +296,29 @@ void loop() {
     }
 
     // ---- Logging (ALWAYS, even if not running) ----
-    if (nowMs - lastPrintMs >= 150) {
+    unsigned long printInterval = binaryTelemetry ? BIN_PRINT_INTERVAL_MS : PRINT_INTERVAL_MS;
+    if (nowMs - lastPrintMs >= printInterval) {
       lastPrintMs = nowMs;
 
       long posSteps = stepper.currentPosition();
 
-      Serial.print(F("P="));       Serial.print(P, 2);
-      Serial.print(F(",P_init=")); Serial.print(P_init, 2);
-      Serial.print(F(",P_low="));  Serial.print(P_low, 2);
-      Serial.print(F(",P_high=")); Serial.print(P_high, 2);
-      Serial.print(F(",posSteps=")); Serial.print(posSteps);
-      Serial.print(F(",state="));
-      if (state == GOING_UP)      Serial.print("UP");
-      else if (state == GOING_DOWN) Serial.print("DOWN");
-      else                        Serial.print("HOLD");
-      Serial.print(F(",stage="));  Serial.print(stageIndex);
-      Serial.print(F(",cycles=")); Serial.print(cycleCount);
-      Serial.print(F(",running=")); Serial.print(testRunning ? 1 : 0);
-      Serial.println();
+      if (binaryTelemetry) {
+        sendBinaryFrame(P, posSteps, nowMs);
+      } else {
+        Serial.print(F("P="));       Serial.print(P, 2);
+        Serial.print(F(",P_init=")); Serial.print(P_init, 2);
+        Serial.print(F(",P_low="));  Serial.print(P_low, 2);
+        Serial.print(F(",P_high=")); Serial.print(P_high, 2);
+        Serial.print(F(",posSteps=")); Serial.print(posSteps);
+        Serial.print(F(",state="));
+        if (state == GOING_UP)      Serial.print("UP");
+        else if (state == GOING_DOWN) Serial.print("DOWN");
+        else                        Serial.print("HOLD");
+        Serial.print(F(",stage="));  Serial.print(stageIndex);
+        Serial.print(F(",cycles=")); Serial.print(cycleCount);
+        Serial.print(F(",running=")); Serial.print(testRunning ? 1 : 0);
+        Serial.println();
+      }
     }
   }
 
@@ -0,0 +1,147 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+# Decode a video once into an on-disk, memory-mapped frame store (raw BGR
+# uint8, optionally cropped to a fixed ROI and downscaled). The tracker and
+# slider.py open a store exactly like a video via open_video(), with random
+# access by frame index, so repeated threshold runs skip H.264 decode.
+#
+#   VID_0079.frames       raw frames, shape (n_frames, height, width, 3)
+#   VID_0079.frames.json  shape, fps, roi, scale, source video
+
+# === Settings (for running this file directly) ===
+SOURCE_VIDEO = 'VID_0079.mp4'
+STORE_PATH   = 'VID_0079.frames'
+STORE_ROI    = None   # (x, y, w, h) in source pixels, or None for full frame
+STORE_SCALE  = 1.0    # e.g. 0.5 -> half resolution (measurements in store pixels!)
+
+STORE_EXT = '.frames'
+
+
+def build_frame_store(video_path, store_path, roi=None, scale=1.0):
+    """Decode `video_path` once into `store_path` (+ .json metadata)."""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+
+    n_frames = 0
+    shape = None
+    # metadata last: a store without it is incomplete and won't open
+    if os.path.exists(store_path + '.json'):
+        os.remove(store_path + '.json')
+
+    with open(store_path, 'wb') as f:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if roi is not None:
+                x, y, w, h = roi
+                frame = frame[y:y + h, x:x + w]
+            if scale != 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale,
+                                   interpolation=cv2.INTER_AREA)
+            if shape is None:
+                shape = frame.shape
+            f.write(np.ascontiguousarray(frame).tobytes())
+            n_frames += 1
+    cap.release()
+
+    if shape is None:
+        shape = (0, 0, 3)
+    meta = {
+        'n_frames': n_frames,
+        'height':   shape[0],
+        'width':    shape[1],
+        'fps':      fps,
+        'roi':      list(roi) if roi is not None else None,
+        'scale':    scale,
+        'source':   os.path.abspath(video_path),
+    }
+    with open(store_path + '.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class FrameStore:
+    """Memory-mapped frame store with the parts of the cv2.VideoCapture API
+    the scripts use (read, grab, set/get position, frame count, fps), plus
+    store[i] for direct read-only access.
+    """
+
+    def __init__(self, store_path):
+        with open(store_path + '.json') as f:
+            self.meta = json.load(f)
+        shape = (self.meta['n_frames'], self.meta['height'], self.meta['width'], 3)
+        self.frames = np.memmap(store_path, dtype=np.uint8, mode='r', shape=shape)
+        self.pos = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, idx):
+        return self.frames[idx]
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self.pos >= len(self.frames):
+            return False, None
+        # copy: callers draw overlays on the frame they get
+        frame = np.array(self.frames[self.pos])
+        self.pos += 1
+        return True, frame
+
+    def grab(self):
+        if self.pos >= len(self.frames):
+            return False
+        self.pos += 1
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.pos)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.frames))
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.meta['fps'])
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.meta['width'])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.meta['height'])
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.pos = min(max(int(value), 0), len(self.frames))
+            return True
+        return False
+
+    def release(self):
+        self.frames = self.frames[:0]
+
+
+def open_video(path):
+    """cv2.VideoCapture for videos, FrameStore for *.frames stores."""
+    if path.endswith(STORE_EXT):
+        return FrameStore(path)
+    return cv2.VideoCapture(path)
+
+
+if __name__ == '__main__':
+    cap = cv2.VideoCapture(SOURCE_VIDEO)
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if STORE_ROI is not None:
+        w, h = STORE_ROI[2], STORE_ROI[3]
+    est_gb = n * int(w * STORE_SCALE) * int(h * STORE_SCALE) * 3 / 1e9
+    print(f"Building {STORE_PATH} from {SOURCE_VIDEO} (~{est_gb:.1f} GB) ...")
+
+    meta = build_frame_store(SOURCE_VIDEO, STORE_PATH, STORE_ROI, STORE_SCALE)
+    print(f"Stored {meta['n_frames']} frames of {meta['width']}x{meta['height']} "
+          f"in {STORE_PATH}")
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+import object_boxing_offset as tracker
+from frame_store import open_video
+
+# === Settings ===
+video_path = 'VID_0079.mp4'   # or a decoded frame store (frame_store.py)
+
+SAMPLE_FRAMES = 36      # frames spread over the whole video
+SEARCH_SCALE  = 1.0     # <1 downscales the samples (faster, erode acts stronger)
+N_CANDIDATES  = 400     # random threshold/morphology sets (plus the current one)
+ERODE_CHOICES = (0, 1, 2, 3)
+SEED          = 0
+N_WORKERS     = os.cpu_count() or 1
+
+# a contour covering more than this share of the frame is background, not specimen
+MAX_AREA_FRAC = 0.9
+
+
+def sample_hsv_frames(path, n_samples):
+    """Blurred HSV images of n_samples frames spread over the video."""
+    cap = open_video(path)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for idx in np.unique(np.linspace(0, max(n_frames - 1, 0), n_samples).astype(int)):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        if SEARCH_SCALE != 1.0:
+            frame = cv2.resize(frame, None, fx=SEARCH_SCALE, fy=SEARCH_SCALE,
+                               interpolation=cv2.INTER_AREA)
+        # same conversion as the tracker's 'hsv' mask engine
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        frames.append(cv2.GaussianBlur(hsv, (5, 5), 0))
+    cap.release()
+    return frames
+
+
+def random_candidates(n, rng):
+    """Random (lower, upper, erode_iter) sets, seeded with the tracker's current one."""
+    cands = [(tracker.lower_green.tolist(), tracker.upper_green.tolist(), tracker.erode_iter)]
+    for _ in range(n):
+        h_lo = int(rng.integers(0, 120))
+        h_hi = int(rng.integers(h_lo + 10, 180))
+        s_lo, v_lo = (int(x) for x in rng.integers(0, 240, size=2))
+        s_hi, v_hi = (int(x) for x in rng.integers(200, 256, size=2))
+        erode = int(rng.choice(ERODE_CHOICES))
+        cands.append(([h_lo, s_lo, v_lo], [h_hi, max(s_hi, s_lo + 10), max(v_hi, v_lo + 10)], erode))
+    return cands
+
+
+_hsv_frames = None
+
+
+def init_worker(samples_path):
+    # memory-mapped: the samples are shared through the page cache instead of
+    # being pickled into every worker (spawn start method on Windows)
+    global _hsv_frames
+    _hsv_frames = np.load(samples_path, mmap_mode='r')
+
+
+def score_candidate(cand):
+    """Score one (lower, upper, erode_iter) set on the sampled frames.
+
+    score = found_rate * fill * dominance / (1 + thickness_cv + area_cv + jitter)
+      fill        mean contour area / minAreaRect area (clean, rectangular mask)
+      dominance   mean contour area / all mask pixels (no competing blobs)
+      thickness   short rect side, should stay constant -> coefficient of variation
+      area_cv     area consistency across frames
+      jitter      spread of the rect center relative to the mean thickness
+    """
+    lower, upper, erode = cand
+    lower = np.array(lower)
+    upper = np.array(upper)
+    kernel = tracker.kernel
+
+    n = len(_hsv_frames)
+    areas, fills, doms, thick, centers = [], [], [], [], []
+    for hsv in _hsv_frames:
+        mask = cv2.inRange(np.asarray(hsv), lower, upper)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        if erode > 0:
+            mask = cv2.erode(mask, kernel, iterations=erode)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            continue
+        largest = max(contours, key=cv2.contourArea)
+        area = cv2.contourArea(largest)
+        if area <= 0 or area > MAX_AREA_FRAC * mask.size:
+            continue
+
+        (cx, cy), (w, h), _ = cv2.minAreaRect(largest)
+        if w * h <= 0:
+            continue
+        areas.append(area)
+        fills.append(area / (w * h))
+        doms.append(area / max(cv2.countNonZero(mask), 1))
+        thick.append(min(w, h))
+        centers.append((cx, cy))
+
+    found_rate = len(areas) / n if n else 0.0
+    if len(areas) < 2:
+        return 0.0, found_rate, cand
+
+    areas = np.array(areas)
+    thick = np.array(thick)
+    centers = np.array(centers)
+    thickness_cv = thick.std() / thick.mean()
+    area_cv = areas.std() / areas.mean()
+    jitter = np.linalg.norm(centers - np.median(centers, axis=0), axis=1).std() / thick.mean()
+
+    score = found_rate * np.mean(fills) * np.mean(doms) / (1.0 + thickness_cv + area_cv + jitter)
+    return float(score), found_rate, cand
+
+
+if __name__ == '__main__':
+    t_start = time.perf_counter()
+    hsv_frames = sample_hsv_frames(video_path, SAMPLE_FRAMES)
+    print(f"Sampled {len(hsv_frames)} frames from {video_path}")
+    if not hsv_frames:
+        raise SystemExit(f"No frames could be read from {video_path}")
+
+    cands = random_candidates(N_CANDIDATES, np.random.default_rng(SEED))
+
+    fd, samples_path = tempfile.mkstemp(suffix='.npy')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.stack(hsv_frames))
+        del hsv_frames
+        with ProcessPoolExecutor(max_workers=N_WORKERS, initializer=init_worker,
+                                 initargs=(samples_path,)) as pool:
+            results = list(pool.map(score_candidate, cands, chunksize=8))
+    finally:
+        os.remove(samples_path)
+
+    results.sort(key=lambda r: r[0], reverse=True)
+    elapsed = time.perf_counter() - t_start
+
+    print(f"Evaluated {len(cands)} candidates in {elapsed:.1f} s\n")
+    print(f"{'score':>7s} {'found':>6s}  lower            upper            erode")
+    for score, found_rate, (lower, upper, erode) in results[:10]:
+        print(f"{score:7.4f} {found_rate * 100:5.0f}%  {str(lower):16s} {str(upper):16s} {erode}")
+
+    score, found_rate, (lower, upper, erode) = results[0]
+    current = next(r for r in results if r[2] == cands[0])
+    print(f"\nCurrent settings score {current[0]:.4f}")
+    print("\nBest parameters for object_boxing_offset.py:\n")
+    print(f"lower_green = np.array({lower})")
+    print(f"upper_green = np.array({upper})")
+    print(f"erode_iter = {erode}")
@@ -0,0 +1,149 @@
+# Live pressure view for log_pressure_delay.py (LIVE_VIEW = True).
+# Runs in its own process and receives samples over local UDP, so a slow
+# redraw can never back up the serial logger. Only the changing artists are
+# redrawn (blitting) and the visible window is decimated to about screen
+# width with min/max buckets, so peaks survive.
+import socket
+import time
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from log_pressure_delay import LIVE_ADDR, LIVE_RECORD
+
+WINDOW_SEC     = 60.0      # visible history
+MAX_POINTS     = 1600      # ~ screen width in pixels (min/max pairs)
+REDRAW_SEC     = 0.1       # redraw interval
+BUFFER_SAMPLES = 200_000   # ring buffer, must cover WINDOW_SEC
+Y_RANGE        = (0.0, 320.0)  # kPa, grows if the pressure leaves it
+
+# same layout as LIVE_RECORD ("<qfffhb", no padding)
+LIVE_DTYPE = np.dtype([('t_ms', '<i8'), ('P', '<f4'), ('P_low', '<f4'),
+                       ('P_high', '<f4'), ('cycles', '<i2'), ('stage', 'i1')])
+assert LIVE_DTYPE.itemsize == LIVE_RECORD.size
+
+
+class Ring:
+    """Fixed-size ring buffer of LIVE_DTYPE records."""
+
+    def __init__(self, n):
+        self.buf = np.zeros(n, dtype=LIVE_DTYPE)
+        self.count = 0  # total records ever written
+
+    def extend(self, rec):
+        n = len(self.buf)
+        rec = rec[-n:]
+        start = self.count % n
+        first = min(len(rec), n - start)
+        self.buf[start:start + first] = rec[:first]
+        self.buf[:len(rec) - first] = rec[first:]
+        self.count += len(rec)
+
+    def latest(self):
+        return self.buf[(self.count - 1) % len(self.buf)]
+
+    def since(self, t_ms):
+        """Records with t_ms >= t_ms, oldest first."""
+        n = len(self.buf)
+        start = self.count % n
+        ordered = np.concatenate([self.buf[start:], self.buf[:start]])
+        if self.count < n:
+            ordered = ordered[n - self.count:]
+        return ordered[np.searchsorted(ordered['t_ms'], t_ms):]
+
+
+def decimate(x, y, n_out):
+    """Min/max per bucket, about n_out points; keeps peaks and valleys."""
+    if len(y) <= n_out:
+        return x, y
+    starts = np.linspace(0, len(y), n_out // 2, endpoint=False).astype(int)
+    lo = np.minimum.reduceat(y, starts)
+    hi = np.maximum.reduceat(y, starts)
+    return np.repeat(x[starts], 2), np.column_stack([lo, hi]).ravel()
+
+
+def drain(sock, ring):
+    """Read every waiting datagram into the ring; False if there was none."""
+    got = False
+    while True:
+        try:
+            data = sock.recv(65536)
+        except BlockingIOError:
+            return got
+        n = len(data) // LIVE_DTYPE.itemsize
+        if n:
+            ring.extend(np.frombuffer(data, dtype=LIVE_DTYPE, count=n))
+            got = True
+
+
+def main():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(LIVE_ADDR)
+    sock.setblocking(False)
+    ring = Ring(BUFFER_SAMPLES)
+
+    fig, ax = plt.subplots(figsize=(12, 4))
+    ax.set_xlim(-WINDOW_SEC, 0)
+    ax.set_ylim(*Y_RANGE)
+    ax.set_xlabel("Time relative to latest sample [s]")
+    ax.set_ylabel("Pressure [kPa]")
+    ax.set_title(f"Live pressure ({LIVE_ADDR[0]}:{LIVE_ADDR[1]})")
+    ax.grid(True)
+
+    (line,) = ax.plot([], [], lw=1.5, animated=True)
+    low = ax.axhline(np.nan, color="tab:green", ls="--", lw=1, animated=True)
+    high = ax.axhline(np.nan, color="tab:red", ls="--", lw=1, animated=True)
+    status = ax.text(0.01, 0.95, "waiting for data...", transform=ax.transAxes,
+                     va="top", animated=True)
+    artists = [line, low, high, status]
+
+    # background without the animated artists; refreshed on every full draw
+    bg = None
+
+    def on_draw(event):
+        nonlocal bg
+        bg = fig.canvas.copy_from_bbox(fig.bbox)
+        for a in artists:
+            ax.draw_artist(a)
+
+    fig.canvas.mpl_connect("draw_event", on_draw)
+    plt.show(block=False)
+    fig.canvas.draw()
+
+    while plt.fignum_exists(fig.number):
+        t_next = time.monotonic() + REDRAW_SEC
+
+        if drain(sock, ring):
+            last = ring.latest()
+            rec = ring.since(last['t_ms'] - int(WINDOW_SEC * 1000))
+            x = (rec['t_ms'] - last['t_ms']) / 1000.0
+            x, y = decimate(x, rec['P'], MAX_POINTS)
+            line.set_data(x, y)
+            low.set_ydata([last['P_low']] * 2)
+            high.set_ydata([last['P_high']] * 2)
+            if last['cycles'] >= 0:
+                status.set_text(f"P = {last['P']:.1f} kPa   band {last['P_low']:.0f}-"
+                                f"{last['P_high']:.0f} kPa   stage {last['stage']}   "
+                                f"cycles {last['cycles']}")
+            else:
+                status.set_text(f"P = {last['P']:.1f} kPa   (no band / cycle fields in telemetry)")
+
+            top = float(np.nanmax([y.max(), last['P_high']]))
+            if top > ax.get_ylim()[1]:
+                # axes change -> full redraw, the draw_event refreshes the background
+                ax.set_ylim(ax.get_ylim()[0], top * 1.1)
+                fig.canvas.draw()
+
+        if bg is not None:
+            fig.canvas.restore_region(bg)
+            for a in artists:
+                ax.draw_artist(a)
+            fig.canvas.blit(fig.bbox)
+        fig.canvas.flush_events()
+        time.sleep(max(t_next - time.monotonic(), 0.0))
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,433 @@
 # log_pressure_clean_prestart.py
 import serial
 import csv
+import os
+import socket
+import struct
+import subprocess
+import sys
 import time
 
-PORT = "COM3"
+import numpy as np
+
+import table_io
+from cycle_detection import CYCLE_DTYPE, CycleDetector
+
+PORT = "COM3"            # rig_simulator.py: "/tmp/rig_sim"
 BAUD = 115200
 OUTFILE = "finaltest_12floors_new.csv"
 
 START_DELAY_SEC = 0      # how long to log before sending 's'
 
-with serial.Serial(PORT, BAUD, timeout=1) as ser, open(OUTFILE, "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["timestamp_ms", "pressure_kPa"])
+NAN = float("nan")
+
+# Bulk reader: everything waiting in the OS serial buffer is read at once and
+# split into lines here; CSV rows are written in batches and the console echo
+# is throttled, so the loop keeps up with high telemetry rates.
+READ_TIMEOUT_SEC = 0.05  # max wait for new bytes (keeps the timers responsive)
+MAX_LINE_BYTES   = 512   # longer fragments without a newline are dropped
+FLUSH_ROWS       = 500   # flush the CSV after this many rows ...
+FLUSH_SEC        = 1.0   # ... or after this many seconds, whichever is first
+ECHO_SEC         = 0.5   # print the latest sample at most this often (0 = every read)
+STATS_SEC        = 10.0  # print line counts and lines/s this often (0 = only at the end)
+
+# Capture mode: "pressure" logs timestamp + P only (table_io "pressure");
+# "full" parses every key=value field of the telemetry line into typed
+# columns (table_io "telemetry") and, after the run, writes the start of
+# every cycle/stage from the rig's own counters to CYCLES_FILE.
+CAPTURE     = "pressure"
+CYCLES_FILE = os.path.splitext(OUTFILE)[0] + "_cycles.csv"
+
+# Online cycle detection (cycle_detection.py, same low_thresh_p / amp_min_p /
+# min_spacing_s semantics as pressure-compression-plot.py): every cycle is
+# appended to LIVE_CYCLES_FILE as soon as it closes, times in s on the
+# timestamp_ms clock. None disables it.
+CYCLE_PARAMS     = {"low_thresh_p": 90.0, "amp_min_p": 20.0, "min_spacing_s": 1.5}
+LIVE_CYCLES_FILE = os.path.splitext(OUTFILE)[0] + "_live_cycles.csv"
+
+# telemetry key -> (column, converter); state is stored as the .ino enum code
+STATE_CODES = {b"HOLD": 0, b"UP": 1, b"DOWN": 2}
+TELEMETRY_FIELDS = {
+    b"P":        ("pressure_kPa", float),
+    b"P_init":   ("P_init_kPa", float),
+    b"P_low":    ("P_low_kPa", float),
+    b"P_high":   ("P_high_kPa", float),
+    b"posSteps": ("posSteps", int),
+    b"state":    ("state", STATE_CODES.__getitem__),
+    b"stage":    ("stage", int),
+    b"cycles":   ("cycles", int),
+    b"running":  ("running", int),
+}
+TELEMETRY_COLUMNS = [column for column, _ in TELEMETRY_FIELDS.values()]
+_FIELD_SLOTS = {key: (i, conv) for i, (key, (_, conv)) in enumerate(TELEMETRY_FIELDS.items())}
+
+# Telemetry format: "ascii" lines, or "binary" frames (the logger sends 'b' to
+# switch the firmware, and 'a' at the end of the run to switch it back; 31
+# instead of ~120 bytes per sample, so the rig can print much faster at the
+# same baud rate). Frames carry a sync word, sequence
+# number, device millis() and CRC; whole buffers are decoded with one
+# np.frombuffer, corrupt bytes are skipped until the next valid frame.
+# Binary runs are always captured in full (table_io "frames").
+TELEMETRY = "ascii"
+
+# cyclic_pressure_test.ino TelemetryFrame (little-endian, packed)
+FRAME_SYNC = 0xA55A
+FRAME_DTYPE = np.dtype([
+    ('sync',         '<u2'),
+    ('seq',          '<u2'),
+    ('device_ms',    '<u4'),
+    ('pressure_kPa', '<f4'),
+    ('P_low_kPa',    '<f4'),
+    ('P_high_kPa',   '<f4'),
+    ('posSteps',     '<i4'),
+    ('state',        'u1'),   # STATE_CODES
+    ('stage',        'u1'),
+    ('cycles',       '<u2'),
+    ('running',      'u1'),
+    ('crc',          '<u2'),  # CRC-16/CCITT-FALSE over seq..running
+])
+FRAME_COLUMNS = ['device_ms', 'seq', 'pressure_kPa', 'P_low_kPa', 'P_high_kPa',
+                 'posSteps', 'state', 'stage', 'cycles', 'running']
+
+# Live view: samples are sent as UDP datagrams to live_view.py, which runs in
+# its own process. Sends never block; if the view is slow or not running the
+# datagrams are simply lost, the log is unaffected.
+LIVE_VIEW       = False   # send samples to the live view ...
+LIVE_VIEW_SPAWN = True    # ... and start live_view.py with the logger
+LIVE_ADDR       = ("127.0.0.1", 47800)
+LIVE_SEND_SEC   = 0.05    # batch samples for this long per datagram
+# t_ms, P, P_low, P_high, cycles, stage (band NaN / counters -1 if the rig does not send them)
+LIVE_RECORD     = struct.Struct("<qfffhb")
+LIVE_MAX_BATCH  = 2000    # records per datagram (stays below the 64 kB UDP limit)
+
+
+def _crc16_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+
+_CRC_TABLE = _crc16_table()
+
+
+def crc16_ccitt(block):
+    """CRC-16/CCITT-FALSE of every row of an (n, k) uint8 array."""
+    crc = np.full(len(block), 0xFFFF, dtype=np.uint16)
+    for column in block.T:
+        crc = (crc << 8) ^ _CRC_TABLE[(crc >> 8) ^ column]
+    return crc
+
+
+def encode_frames(frames):
+    """Bytes of FRAME_DTYPE records with sync word and CRC filled in (simulator/tests)."""
+    frames = np.array(frames, dtype=FRAME_DTYPE)
+    frames['sync'] = FRAME_SYNC
+    raw = frames.view(np.uint8).reshape(len(frames), FRAME_DTYPE.itemsize)
+    frames['crc'] = crc16_ccitt(raw[:, 2:-2])
+    return frames.tobytes()
+
+
+class FrameDecoder:
+    """Incremental decoder of binary telemetry frames with resynchronization.
+
+    Every sync-word position with a complete frame behind it is CRC-checked
+    at once; valid, non-overlapping frames are decoded with np.frombuffer.
+    Bytes in between (corruption, text info messages) are skipped.
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.last_seq = None
+        self.skipped = 0      # bytes thrown away while resynchronizing
+        self.bad_frames = 0   # sync word found but CRC mismatch
+        self.lost = 0         # frames missing according to the sequence number
+
+    def feed(self, data):
+        """Append raw bytes, return the decoded frames (FRAME_DTYPE array)."""
+        self.buf += data
+        size = FRAME_DTYPE.itemsize
+        last = len(self.buf) - size   # last position a complete frame can start
+        if last < 0:
+            return np.zeros(0, dtype=FRAME_DTYPE)
 
-    print(f"Opened {PORT} at {BAUD} baud")
+        buf = bytes(self.buf)
+        arr = np.frombuffer(buf, dtype=np.uint8)
+        sync = FRAME_SYNC.to_bytes(2, 'little')
+        starts = np.flatnonzero((arr[:last + 1] == sync[0]) & (arr[1:last + 2] == sync[1]))
+
+        block = arr[starts[:, None] + np.arange(size)]
+        crc = block[:, -2].astype(np.uint16) | (block[:, -1].astype(np.uint16) << 8)
+        valid = crc16_ccitt(block[:, 2:-2]) == crc
+        good = starts[valid]
+        if np.any(np.diff(good) < size):
+            # a CRC match inside an accepted frame is a false positive
+            keep, end = [], -1
+            for s in good.tolist():
+                if s >= end:
+                    keep.append(s)
+                    end = s + size
+            good = np.array(keep, dtype=np.intp)
+
+        # failed candidates that are not just payload bytes of a good frame
+        bad = starts[~valid]
+        inside = np.zeros(len(bad), dtype=bool)
+        if len(good):
+            owner = np.maximum(np.searchsorted(good, bad, side='right') - 1, 0)
+            inside = (good[owner] <= bad) & (bad < good[owner] + size)
+        self.bad_frames += int(np.count_nonzero(~inside))
+
+        if len(good) and good[-1] - good[0] == (len(good) - 1) * size:
+            # clean stream: frames are back to back
+            frames = np.frombuffer(buf, dtype=FRAME_DTYPE, count=len(good),
+                                   offset=int(good[0])).copy()
+        else:
+            frames = block[valid][np.isin(starts[valid], good)].copy().view(FRAME_DTYPE).ravel()
+
+        consumed = max(int(good[-1]) + size if len(good) else 0, last + 1)
+        self.skipped += consumed - len(good) * size
+        del self.buf[:consumed]
+
+        if len(frames):
+            seq = frames['seq'].astype(np.int64)
+            prev = seq[0] - 1 if self.last_seq is None else self.last_seq
+            gaps = (np.diff(seq, prepend=prev) - 1) % 65536
+            self.lost += int(gaps.sum())
+            self.last_seq = int(seq[-1])
+        return frames
+
+
+class LineSplitter:
+    """Incremental newline splitter over a reusable byte buffer."""
+
+    def __init__(self, max_line=MAX_LINE_BYTES):
+        self.buf = bytearray()
+        self.max_line = max_line
+        self.dropped = 0
+
+    def feed(self, data):
+        """Append raw bytes, return the complete lines (bytes, without newline)."""
+        self.buf += data
+        lines = []
+        end = self.buf.rfind(b'\n')
+        if end >= 0:
+            lines = bytes(self.buf[:end]).split(b'\n')
+            del self.buf[:end + 1]
+        if len(self.buf) > self.max_line:
+            # no line ending in sight -> line noise or lost sync, drop it
+            self.buf.clear()
+            self.dropped += 1
+        return lines
+
+
+class BatchWriter:
+    """csv.writer with batched rows and size/time bounded flushing."""
+
+    def __init__(self, f, header, flush_rows=FLUSH_ROWS, flush_sec=FLUSH_SEC):
+        self.f = f
+        self.writer = csv.writer(f)
+        self.writer.writerow(header)
+        self.rows = []
+        self.flush_rows = flush_rows
+        self.flush_sec = flush_sec
+        self.last_flush = time.monotonic()
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_rows:
+            self.flush()
+
+    def extend(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.flush_rows:
+            self.flush()
+
+    def poll(self, now):
+        """Flush if rows have been waiting longer than flush_sec."""
+        if self.rows and now - self.last_flush >= self.flush_sec:
+            self.flush()
+
+    def flush(self):
+        self.writer.writerows(self.rows)
+        self.rows.clear()
+        self.f.flush()
+        self.last_flush = time.monotonic()
+
+
+class LiveFeed:
+    """Batched, non-blocking UDP feed of logged rows for live_view.py."""
+
+    def __init__(self, addr=LIVE_ADDR, send_sec=LIVE_SEND_SEC):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.addr = addr
+        self.send_sec = send_sec
+        self.records = []
+        self.last_send = time.monotonic()
+        self.lost = 0
+
+    def add(self, row):
+        """CAPTURE = "full" row (timestamp_ms + TELEMETRY_COLUMNS)."""
+        t_ms, p, _, p_low, p_high, _, _, stage, cycles, _ = row
+        self.records.append(LIVE_RECORD.pack(t_ms, p, p_low, p_high, cycles, stage))
+
+    def add_line(self, t_ms, p, line):
+        """CAPTURE = "pressure" sample; band and counters are parsed from the
+        raw line for the view only (NaN / -1 if the line does not have them)."""
+        try:
+            values = parse_telemetry(line)
+        except ValueError:
+            values = None
+        if values is not None:
+            self.add([t_ms] + values)
+        else:
+            self.records.append(LIVE_RECORD.pack(t_ms, p, NAN, NAN, -1, -1))
 
-    # — Wait for Arduino reboot —
-    time.sleep(2.0)
-    ser.reset_input_buffer()
+    def add_frames(self, frames):
+        """Binary frames, on the device clock."""
+        columns = [frames[name].tolist() for name in
+                   ('device_ms', 'pressure_kPa', 'P_low_kPa', 'P_high_kPa', 'cycles', 'stage')]
+        self.records.extend(LIVE_RECORD.pack(*values) for values in zip(*columns))
+
+    def poll(self, now):
+        if self.records and now - self.last_send >= self.send_sec:
+            self.send()
+
+    def send(self):
+        for i in range(0, len(self.records), LIVE_MAX_BATCH):
+            batch = self.records[i:i + LIVE_MAX_BATCH]
+            try:
+                self.sock.sendto(b"".join(batch), self.addr)
+            except OSError:
+                # full socket buffer or no listener -> the view misses these
+                self.lost += len(batch)
+        self.records.clear()
+        self.last_send = time.monotonic()
+
+    def close(self):
+        self.sock.close()
+
+
+class LiveCycles:
+    """CycleDetector feeding a CSV that grows by one row per closed cycle."""
+
+    def __init__(self, path, params):
+        self.detector = CycleDetector(**params)
+        self.f = open(path, "w", newline="")
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(CYCLE_DTYPE.names)
+        self.f.flush()
+
+    def update(self, t_s, p):
+        self._write(self.detector.update_block(t_s, p))
+
+    def close(self):
+        self._write(self.detector.close())
+        self.f.close()
+
+    def _write(self, cycles):
+        if not cycles:
+            return
+        self.writer.writerows(cycles)
+        self.f.flush()
+        for n, start, end, p_min, p_max, _ in cycles:
+            print(f">>> Cycle {n}: {start:.1f}-{end:.1f} s, {p_min:.1f}-{p_max:.1f} kPa")
+
+
+class LogStats:
+    """Line counters and sustained lines/s of a logging run."""
+
+    def __init__(self):
+        self.lines = 0
+        self.samples = 0
+        self.info = 0
+        self.malformed = 0
+        self.t0 = time.monotonic()
+        self.last_t = self.t0
+        self.last_lines = 0
+
+    def report(self, dropped):
+        now = time.monotonic()
+        total_rate = self.lines / max(now - self.t0, 1e-9)
+        rate = (self.lines - self.last_lines) / max(now - self.last_t, 1e-9)
+        self.last_t, self.last_lines = now, self.lines
+        print(f"[stats] {self.lines} lines ({rate:.0f} lines/s now, "
+              f"{total_rate:.0f} lines/s overall), {self.samples} samples, "
+              f"{self.info} info, {self.malformed} malformed, {dropped} dropped")
+
+
+def parse_pressure(line):
+    """[P] of a telemetry line as float; None if there is no P= field.
+
+    Raises ValueError if the P= field is not a number.
+    """
+    for field in line.split(b','):
+        field = field.strip()
+        if field.startswith(b'P='):
+            return [float(field[2:])]
+    return None
+
+
+def parse_telemetry(line):
+    """Typed values of all TELEMETRY_FIELDS, in TELEMETRY_COLUMNS order.
+
+    Returns None for lines that are not telemetry (info messages); raises
+    ValueError for telemetry lines with missing or unparsable fields.
+    """
+    if not line.startswith(b'P='):
+        return None
+    row = [None] * len(_FIELD_SLOTS)
+    for field in line.split(b','):
+        key, _, value = field.strip().partition(b'=')
+        slot = _FIELD_SLOTS.get(key)
+        if slot is None:
+            continue
+        try:
+            row[slot[0]] = slot[1](value)
+        except KeyError:
+            raise ValueError(f"unknown value {value!r} for {key!r}")
+    if None in row:
+        raise ValueError("missing telemetry field")
+    return row
+
+
+def save_cycle_table(telemetry_csv, cycles_csv, schema="telemetry"):
+    """First sample of every (cycle, stage) while running, from the telemetry counters."""
+    tel = table_io.load_table(telemetry_csv, schema)
+    run = tel[tel["running"] == 1]
+    seg = run[["cycles", "stage"]]
+    starts = run[(seg != seg.shift()).any(axis=1)]
+    starts = starts[["cycles", "stage", "timestamp_ms", "P_low_kPa", "P_high_kPa"]]
+    table_io.save_table(starts.rename(columns={"timestamp_ms": "start_ms"}),
+                        cycles_csv, "cycles")
+    return len(starts)
+
+
+def send_command(ser, cmd):
+    ser.write(cmd + b'\n')
+    ser.flush()
+
+
+def log_serial(ser, f):
+    """Log telemetry from `ser` to the open CSV file `f` until Ctrl+C."""
+    decoder = None
+    if TELEMETRY == "binary":
+        out = BatchWriter(f, ["timestamp_ms"] + FRAME_COLUMNS)
+        decoder = FrameDecoder()
+    elif CAPTURE == "full":
+        out = BatchWriter(f, ["timestamp_ms"] + TELEMETRY_COLUMNS)
+        parse = parse_telemetry
+    else:
+        out = BatchWriter(f, ["timestamp_ms", "pressure_kPa"])
+        parse = parse_pressure
+    splitter = LineSplitter()
+    stats = LogStats()
+
+    def dropped():
+        return splitter.dropped + (decoder.lost if decoder is not None else 0)
 
     print("Logging started BEFORE starting test...")
 
@@ -25,56 +435,158 @@ with serial.Serial(PORT, BAUD, timeout=1) as ser, open(OUTFILE, "w", newline="")
     start_command_sent = False
     start_send_time = start_ms + int(START_DELAY_SEC * 1000)
 
+    live = LiveFeed() if LIVE_VIEW else None
+    cycles = LiveCycles(LIVE_CYCLES_FILE, CYCLE_PARAMS) if CYCLE_PARAMS else None
+    last_sample = None
+    last_echo = last_stats = time.monotonic()
+
+    if decoder is not None:
+        send_command(ser, b'b')
+        print(">>> Switched Arduino to binary telemetry")
+    else:
+        # a board that did not reset on open may still be in binary mode from
+        # an earlier run; switch it back and drop any frames already queued
+        send_command(ser, b'a')
+        time.sleep(0.1)
+        ser.reset_input_buffer()
+
     try:
         while True:
-            now_ms = int(time.time() * 1000)
-
             # ---- Send start command after delay ----
-            if not start_command_sent and now_ms >= start_send_time:
-                ser.write(b's\n')
-                ser.flush()
+            if not start_command_sent and int(time.time() * 1000) >= start_send_time:
+                send_command(ser, b's')
                 start_command_sent = True
                 print(">>> Sent START command to Arduino")
 
-            # ---- Read Arduino ----
-            raw = ser.readline().decode(errors="replace").strip()
-            if not raw:
-                continue
-
-            # Try to extract pressure field P=<value>
-            fields = raw.split(',')
-            p_val = None
+            # ---- Read everything that is waiting (or wait up to the timeout) ----
+            data = ser.read(max(1, ser.in_waiting))
+            # lines of one read share its arrival time
+            t_ms = int(time.time() * 1000) - start_ms
 
-            for field in fields:
-                field = field.strip()
-                if field.startswith("P="):
+            if decoder is not None:
+                frames = decoder.feed(data)
+                if len(frames):
+                    rows = [[t_ms, *values] for values in frames[FRAME_COLUMNS].tolist()]
+                    out.extend(rows)
+                    stats.lines += len(rows)
+                    stats.samples += len(rows)
+                    stats.malformed = decoder.bad_frames
+                    last_sample = rows[-1]
+                    if live is not None:
+                        live.add_frames(frames)
+                    if cycles is not None:
+                        cycles.update(np.full(len(frames), t_ms / 1000.0), frames['pressure_kPa'])
+            else:
+                chunk_p = []
+                for line in splitter.feed(data):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    stats.lines += 1
                     try:
-                        p_val = float(field[2:])
+                        values = parse(line)
                     except ValueError:
-                        p_val = None
-                    break
+                        stats.malformed += 1
+                        continue
+
+                    if values is None:
+                        # Other info lines (like welcome message, stage info)
+                        stats.info += 1
+                        print("INFO:", line.decode(errors="replace"))
+                        continue
+
+                    # ---- Log pressure ----
+                    row = [t_ms] + values
+                    out.add(row)
+                    stats.samples += 1
+                    last_sample = row
+                    chunk_p.append(values[0])
+                    if live is not None:
+                        if CAPTURE == "full":
+                            live.add(row)
+                        else:
+                            live.add_line(t_ms, values[0], line)
 
-            if p_val is None:
-                # Other info lines (like welcome message, stage info)
-                print("INFO:", raw)
-                continue
+                if cycles is not None and chunk_p:
+                    cycles.update(np.full(len(chunk_p), t_ms / 1000.0), chunk_p)
 
-            # ---- Log pressure ----
-            t_ms = now_ms - start_ms
-            writer.writerow([t_ms, p_val])
-            f.flush()
-            print(t_ms, p_val)
+            now = time.monotonic()
+            out.poll(now)
+            if live is not None:
+                live.poll(now)
+            if last_sample is not None and now - last_echo >= ECHO_SEC:
+                print(*last_sample)
+                last_sample = None
+                last_echo = now
+            if STATS_SEC > 0 and now - last_stats >= STATS_SEC:
+                stats.report(dropped())
+                last_stats = now
 
     except KeyboardInterrupt:
         print("\nStopping...")
 
         # Stop Arduino test
         try:
-            ser.write(b'x\n')
-            ser.flush()
+            send_command(ser, b'x')
             print(">>> Sent STOP command to Arduino")
             time.sleep(0.2)
         except Exception as e:
             print("Error while sending stop:", e)
 
-print("Done.")
+    finally:
+        if decoder is not None:
+            # leave the rig in its default ASCII mode for the next run
+            try:
+                send_command(ser, b'a')
+                print(">>> Switched Arduino back to ASCII telemetry")
+            except Exception as e:
+                print("Error while switching back to ASCII:", e)
+        out.flush()
+        if cycles is not None:
+            cycles.close()
+        if live is not None:
+            live.send()
+            live.close()
+        if decoder is not None:
+            stats.malformed = decoder.bad_frames
+            print(f"[binary] {decoder.skipped} bytes skipped while resynchronizing")
+        stats.report(dropped())
+
+
+def main():
+    if LIVE_VIEW and LIVE_VIEW_SPAWN:
+        # own process, so redraws never stall the serial reads
+        subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       "live_view.py")])
+
+    with serial.Serial(PORT, BAUD, timeout=READ_TIMEOUT_SEC) as ser, \
+         open(OUTFILE, "w", newline="") as f:
+        print(f"Opened {PORT} at {BAUD} baud")
+
+        # — Wait for Arduino reboot —
+        time.sleep(2.0)
+        ser.reset_input_buffer()
+
+        log_serial(ser, f)
+
+    if TELEMETRY == "binary":
+        schema = "frames"
+    else:
+        schema = "telemetry" if CAPTURE == "full" else "pressure"
+
+    # typed .npy twin for plot_alignment.py (CSV stays for humans)
+    if table_io.WRITE_BINARY:
+        table_io.csv_to_binary(OUTFILE, schema)
+    if schema != "pressure":
+        n = save_cycle_table(OUTFILE, CYCLES_FILE, schema)
+        print(f"{n} cycle/stage starts saved to {CYCLES_FILE}")
+    if CYCLE_PARAMS:
+        if table_io.WRITE_BINARY:
+            table_io.csv_to_binary(LIVE_CYCLES_FILE, "pressure_cycles")
+        print(f"Live cycle table saved to {LIVE_CYCLES_FILE}")
+
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,38 +2,124 @@ import cv2
 import numpy as np
 import csv
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import table_io
+from frame_store import open_video
 
 # === Settings ===
-video_path = 'VID_0079.mp4'
+video_path = 'VID_0079.mp4'   # or a decoded frame store (frame_store.py)
 save_snapshots = False
 snapshot_dir = 'frames'
     
+# Annotated QA video (green + yellow boxes and labels) encoded on a
+# background thread instead of per-frame JPEGs; only every Nth frame is
+# annotated and written. Sequential and pipelined modes only.
+save_video           = False
+annotated_video_path = '20x_test_annotated.mp4'
+ANNOTATE_EVERY_N     = 1
+VIDEO_FOURCC         = 'mp4v'
+VIDEO_QUEUE_DEPTH    = 64
+
 csv_path_green  = '20x_test_green.csv'   # full box (with glue)
 csv_path_yellow = '20x_test_yellow.csv'  # offset box (without glue)
 
+# Raw minAreaRect geometry per frame (center, size, angle, box corners),
+# stored as a compact .npy so offsets can be re-applied without decoding
+SAVE_GEOMETRY = True
+geometry_path = '20x_test_geometry.npy'
+# True -> skip tracking, rebuild both CSVs from geometry_path with the
+#         current LEFT/RIGHT_OFFSET_PX
+FROM_GEOMETRY = False
+
 # Offsets along specimen length (horizontal direction), in pixels
 # -> tweak these using the interactive slider script first
 LEFT_OFFSET_PX  = 0   # cut away from left
 RIGHT_OFFSET_PX = 0   # cut away from right
 
-# === Setup ===
-cap = cv2.VideoCapture(video_path)
-cv2.namedWindow('Frame', cv2.WINDOW_NORMAL)
-cv2.namedWindow('Mask',  cv2.WINDOW_NORMAL)
+# Headless batch mode: no windows, no overlay drawing, no waitKey throttle
+# -> runs as fast as decode allows (use on analysis boxes without a display)
+HEADLESS = False
+
+# Parallel mode: split the video into frame ranges and track them in a
+# process pool (always headless). Output is identical to the sequential run.
+PARALLEL  = False
+N_WORKERS = os.cpu_count() or 1
 
-if save_snapshots and not os.path.exists(snapshot_dir):
-    os.makedirs(snapshot_dir)
+# Pipelined mode: decoder thread -> bounded frame queue -> processing threads
+# -> in-order CSV writer (always headless). OpenCV releases the GIL, so decode
+# and morphology overlap. At most PIPELINE_QUEUE_DEPTH frames are in flight
+# (queued, processing or waiting to be reordered), so memory stays bounded.
+PIPELINED            = False
+PIPELINE_WORKERS     = 2
+PIPELINE_QUEUE_DEPTH = 32
 
-csv_file_green  = open(csv_path_green,  mode='w', newline='')
-csv_file_yellow = open(csv_path_yellow, mode='w', newline='')
+# ROI tracking: after the first detection only a padded window around the
+# previous box is processed; full-frame search again when the specimen is
+# lost or touches the window edge (sequential and parallel modes)
+ROI_TRACKING = False
+ROI_PAD_PX   = 40
 
-writer_green  = csv.writer(csv_file_green)
-writer_yellow = csv.writer(csv_file_yellow)
+# Coarse-to-fine detection: locate the specimen on a 1/PYRAMID_SCALE frame,
+# then refine minAreaRect at full resolution inside the upscaled region
+# (1 = off, 2 or 4 = on). PYRAMID_VALIDATE_FRAMES frames spread over the
+# video are also measured on the full-resolution path to report deviation.
+PYRAMID_SCALE           = 1
+PYRAMID_VALIDATE_FRAMES = 50
 
-writer_green.writerow(['Frame', 'Width_green_px', 'Height_green_px'])
-writer_yellow.writerow(['Frame', 'Width_yellow_px', 'Height_yellow_px'])
+# Mask engine: 'hsv' = cvtColor + GaussianBlur + inRange (reference),
+# 'lut' = one lookup per pixel in a 2^24-entry BGR -> in-range table indexed
+# by the packed BGRX pixel (16 MB, built once per threshold set from LUT_BINS
+# color bins per channel, a power of two <= 256). Whether it beats 'hsv'
+# depends on how many distinct colors the footage has (table cache misses),
+# so LUT_VALIDATE_FRAMES frames are compared against the 'hsv' engine after
+# the run (pixel agreement and measured speedup). No blur by default, so
+# edges can differ slightly from 'hsv'; LUT_BLUR_MASK blurs the binary mask
+# instead, which eats most of the gain.
+MASK_ENGINE         = 'hsv'
+LUT_BINS            = 32
+LUT_BLUR_MASK       = False
+LUT_VALIDATE_FRAMES = 50
 
-frame_num = 0
+# Adaptive sampling for long quasi-static tests: the video is decoded once,
+# front to back, but only every ADAPTIVE_STEP-th frame is measured. An interval
+# is bisected while Height_yellow_px at its midpoint or quarter points deviates
+# from linear interpolation by more than ADAPTIVE_TOL_PX (or detection flips),
+# using the decoded frames of the current interval, which are kept in memory
+# (ADAPTIVE_STEP + 1 frames). Remaining frames are interpolated; the CSVs get
+# a 'Measured' flag column. This saves the mask/contour work, not the decode.
+# Only the probed frames are checked, so ADAPTIVE_TOL_PX is a refinement
+# threshold, not an error bound for the interpolated rows. No geometry file
+# is saved (it would be sparse).
+ADAPTIVE        = False
+ADAPTIVE_STEP   = 16
+ADAPTIVE_TOL_PX = 1.0
+
+# Per-stage timing of the sequential loop only (decode, color mask, morphology,
+# contours, geometry, drawing, CSV, snapshot/video output, GUI): prints
+# mean/p50/p99 ms per stage at the end; TIMING_CSV (or None) additionally
+# gets one row of stage times per frame.
+TIMING     = False
+TIMING_CSV = '20x_test_timing.csv'
+
+# Multi-object mode: several specimens (or tower floors) from one decode and
+# one HSV conversion per frame, written to a single wide CSV with per-object
+# columns. Each entry of MULTI_RANGES is (name, lower_hsv, upper_hsv)
+# (None -> one range from lower/upper_green); every range keeps its
+# MULTI_K largest contours, named <name>1..<name>K when MULTI_K > 1.
+# Identities are assigned left to right on the first frame where all MULTI_K
+# contours of a range are found (until then that range's columns stay empty)
+# and then follow the nearest previous center, so an object keeps its columns
+# while it moves. Always uses the 'hsv' mask on full frames: MASK_ENGINE,
+# ROI_TRACKING, PYRAMID_SCALE, save_video and TIMING do not apply.
+MULTI_TRACKING      = False
+MULTI_RANGES        = None   # e.g. [('A', [35, 80, 60], [85, 255, 255]), ...]
+MULTI_K             = 2
+csv_path_multi      = '20x_test_multi.csv'
+multi_geometry_path = '20x_test_multi_geometry.npy'  # (frames, objects)
 
 # === HSV thresholds ===
 lower_green = np.array([0, 158, 62])
@@ -43,138 +129,1086 @@ upper_green = np.array([179, 255, 255])
 kernel = np.ones((3, 3), np.uint8)
 erode_iter = 3
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
+# one record per frame; 'found' is False when no contour was detected
+GEOMETRY_DTYPE = np.dtype([
+    ('frame',  '<i4'),
+    ('found',  '?'),
+    ('center', '<f4', (2,)),
+    ('size',   '<f4', (2,)),
+    ('angle',  '<f4'),
+    ('box',    '<i2', (4, 2)),
+])
+
+
+class StageTimer:
+    """Accumulates perf_counter_ns time per stage and frame (see TIMING)."""
+
+    STAGES = ('decode', 'pyramid', 'color', 'morphology', 'contours',
+              'geometry', 'draw', 'csv', 'output', 'gui')
+
+    def __init__(self):
+        self.current = dict.fromkeys(self.STAGES, 0)
+        self.rows = []
+
+    def add(self, stage, ns):
+        self.current[stage] += ns
+
+    def end_frame(self):
+        self.rows.append([self.current[stage] for stage in self.STAGES])
+        self.current = dict.fromkeys(self.STAGES, 0)
+
+    def summary(self, elapsed):
+        ms = np.array(self.rows, dtype=np.int64).reshape(-1, len(self.STAGES)) / 1e6
+        n = len(ms)
+        if n == 0:
+            return
+        total = ms.sum(axis=1)
+        print(f"{'stage':12s} {'mean ms':>9s} {'p50 ms':>9s} {'p99 ms':>9s} {'share':>7s}")
+        for i, stage in enumerate(self.STAGES):
+            col = ms[:, i]
+            share = col.sum() / total.sum() * 100 if total.sum() > 0 else 0.0
+            print(f"{stage:12s} {col.mean():9.3f} {np.percentile(col, 50):9.3f} "
+                  f"{np.percentile(col, 99):9.3f} {share:6.1f}%")
+        print(f"{'total':12s} {total.mean():9.3f} {np.percentile(total, 50):9.3f} "
+              f"{np.percentile(total, 99):9.3f}")
+        print(f"{n} frames, {n / elapsed if elapsed > 0 else 0.0:.1f} frames/s")
 
+    def write_csv(self, path):
+        with open(path, mode='w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Frame'] + [f'{stage}_ms' for stage in self.STAGES])
+            for frame_num, row in enumerate(self.rows):
+                writer.writerow([frame_num] + [f'{ns / 1e6:.4f}' for ns in row])
+
+
+_timer = None  # StageTimer while a timed sequential run is active
+
+
+def lap(stage, t0):
+    """Charge the time since t0 to `stage` and return the new start time."""
+    if _timer is None:
+        return 0
+    t1 = time.perf_counter_ns()
+    _timer.add(stage, t1 - t0)
+    return t1
+
+
+def lap_start():
+    return time.perf_counter_ns() if _timer is not None else 0
+
+
+def hsv_mask(frame):
     hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
     hsv = cv2.GaussianBlur(hsv, (5, 5), 0)
 
-    mask = cv2.inRange(hsv, lower_green, upper_green)
+    return cv2.inRange(hsv, lower_green, upper_green)
+
 
-    # morphology
+def clean_mask(mask):
+    """Open, close and erode a binary mask (kernel / erode_iter)."""
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
     mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
     if erode_iter > 0:
         mask = cv2.erode(mask, kernel, iterations=erode_iter)
+    return mask
+
+
+_lut_cache = {}
+
+
+def color_lut(lower, upper, bins):
+    """uint8 (0/255) table over all 2^24 colors, indexed by r << 16 | g << 8 | b.
+
+    Each entry tells whether the center of its color bin (`bins` per channel)
+    is inside [lower, upper].
+    """
+    if bins & (bins - 1) or not 2 <= bins <= 256:
+        raise ValueError(f"LUT_BINS must be a power of two in 2..256, got {bins}")
+    key = (tuple(int(c) for c in lower), tuple(int(c) for c in upper), bins)
+    lut = _lut_cache.get(key)
+    if lut is None:
+        step = 256 // bins
+        centers = (np.arange(bins) * step + step // 2).astype(np.uint8)
+        r, g, b = np.meshgrid(centers, centers, centers, indexing='ij')
+        bgr = np.stack([b, g, r], axis=-1).reshape(-1, 1, 3)
+        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+        coarse = cv2.inRange(hsv, lower, upper).reshape(bins, bins, bins)
+        lut = coarse.repeat(step, 0).repeat(step, 1).repeat(step, 2).ravel()
+        _lut_cache[key] = lut
+    return lut
+
+
+def lut_mask(frame):
+    """Binary mask from a single table lookup per pixel (see MASK_ENGINE)."""
+    lut = color_lut(lower_green, upper_green, LUT_BINS)
+
+    # the little-endian BGRX pixel with X = 0 is the table index
+    bgrx = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+    bgrx[..., 3] = 0
+    mask = lut.take(bgrx.view('<u4')[..., 0], mode='clip')
+    if LUT_BLUR_MASK:
+        mask = cv2.GaussianBlur(mask, (5, 5), 0)
+        _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+    return mask
+
+
+def find_largest_contour(frame, roi=None):
+    """Mask the specimen and return (mask, largest contour or None).
+
+    With `roi` = (x, y, w, h) only that window is processed; the contour is
+    returned in full-frame coordinates. A contour touching an inner window
+    edge may be cut off, so it is rejected (None) to force a full search.
+    """
+    frame_h, frame_w = frame.shape[:2]
+    offset = (0, 0)
+    if roi is not None:
+        x, y, w, h = roi
+        frame = frame[y:y + h, x:x + w]
+        offset = (x, y)
+
+    t0 = lap_start()
+    mask = lut_mask(frame) if MASK_ENGINE == 'lut' else hsv_mask(frame)
+    t0 = lap('color', t0)
+
+    mask = clean_mask(mask)
+    t0 = lap('morphology', t0)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                   offset=offset)
+    if not contours:
+        lap('contours', t0)
+        return mask, None
+
+    largest_contour = max(contours, key=cv2.contourArea)
+    lap('contours', t0)
+
+    if roi is not None:
+        bx, by, bw, bh = cv2.boundingRect(largest_contour)
+        # window edges that coincide with the frame border don't count
+        if ((bx <= x and x > 0) or (by <= y and y > 0) or
+                (bx + bw >= x + w and x + w < frame_w) or
+                (by + bh >= y + h and y + h < frame_h)):
+            return mask, None
+
+    return mask, largest_contour
+
+
+def roi_around(box, frame_shape):
+    """Padded, clipped (x, y, w, h) window around box corners (None = full frame)."""
+    frame_h, frame_w = frame_shape[:2]
+    bx, by, bw, bh = cv2.boundingRect(np.asarray(box, dtype=np.int32))
+    x0 = max(bx - ROI_PAD_PX, 0)
+    y0 = max(by - ROI_PAD_PX, 0)
+    x1 = min(bx + bw + ROI_PAD_PX, frame_w)
+    y1 = min(by + bh + ROI_PAD_PX, frame_h)
+    if x1 <= x0 or y1 <= y0 or (x0 == 0 and y0 == 0 and x1 == frame_w and y1 == frame_h):
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def coarse_roi(frame, scale):
+    """Find the specimen on a downscaled frame; full-res window around it (or None)."""
+    t0 = lap_start()
+    small = cv2.resize(frame, None, fx=1.0 / scale, fy=1.0 / scale,
+                       interpolation=cv2.INTER_AREA)
+    lap('pyramid', t0)
+    _, contour = find_largest_contour(small)
+    if contour is None:
+        return None
+    bx, by, bw, bh = cv2.boundingRect(contour)
+    # +1 cell so the upscaled region covers the partially filled border pixels
+    corners = np.array([[bx, by], [bx + bw + 1, by + bh + 1]]) * scale
+    return roi_around(corners, frame.shape)
+
+
+def geometry_from_rect(frame_num, rect):
+    """One-row GEOMETRY_DTYPE array for a minAreaRect (rect=None -> not found)."""
+    geom = np.zeros(1, dtype=GEOMETRY_DTYPE)
+    geom['frame'] = frame_num
+    if rect is not None:
+        geom['found']  = True
+        geom['center'] = rect[0]
+        geom['size']   = rect[1]
+        geom['angle']  = rect[2]
+        geom['box']    = cv2.boxPoints(rect).astype(int)
+    return geom
+
+
+def boxes_from_geometry(geom, left_off=None, right_off=None):
+    """Green and yellow box sizes for every row of a geometry array.
+
+    Vectorized over all frames, so new glue offsets can be applied to a saved
+    geometry file without decoding the video again. Offsets default to
+    LEFT_OFFSET_PX / RIGHT_OFFSET_PX.
+
+    Returns a dict of int arrays 'width_green', 'height_green', 'width_yellow',
+    'height_yellow', a bool array 'yellow_valid' and the yellow box corners
+    'yellow_box' with shape (N, 4, 2).
+    """
+    if left_off is None:
+        left_off = LEFT_OFFSET_PX
+    if right_off is None:
+        right_off = RIGHT_OFFSET_PX
+
+    found = geom['found']
+
+    # define width/height as shorter/longer side (for logging)
+    w = geom['size'][:, 0].astype(float)
+    h = geom['size'][:, 1].astype(float)
+    width_green  = np.where(found, np.minimum(w, h), 0).astype(int)
+    height_green = np.where(found, np.maximum(w, h), 0).astype(int)
+
+    # --- YELLOW BOX (offset along horizontal / length direction) ---
+    box = geom['box'].astype(float)
 
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # sort corners by x to get left/right edges (stable, ties keep corner order)
+    order = np.argsort(geom['box'][:, :, 0], axis=1, kind='stable')
+    box_sorted_x = np.take_along_axis(box, order[:, :, None], axis=1)
 
-    width_green = height_green = 0
-    width_yellow = height_yellow = 0
+    left_center  = box_sorted_x[:, :2].mean(axis=1)
+    right_center = box_sorted_x[:, 2:].mean(axis=1)
 
-    if contours:
-        largest_contour = max(contours, key=cv2.contourArea)
+    vec_lr = right_center - left_center
+    len_lr = np.linalg.norm(vec_lr, axis=1)
+    has_axis = found & (len_lr > 1e-6)
 
+    # unit vector along specimen length (approximately horizontal)
+    u = vec_lr / np.where(has_axis, len_lr, 1.0)[:, None]
+    # perpendicular direction (thickness)
+    v = np.stack([-u[:, 1], u[:, 0]], axis=1)
+
+    # project original corners to (s,t) coordinates
+    s_vals = box[:, :, 0] * u[:, None, 0] + box[:, :, 1] * u[:, None, 1]
+    t_vals = box[:, :, 0] * v[:, None, 0] + box[:, :, 1] * v[:, None, 1]
+
+    s_min, s_max = s_vals.min(axis=1), s_vals.max(axis=1)
+    t_min, t_max = t_vals.min(axis=1), t_vals.max(axis=1)
+
+    L0 = s_max - s_min  # original length along u
+
+    # offsets too large -> nothing left, yellow box stays 0
+    yellow_valid = has_axis & (left_off + right_off < L0 - 1)
+
+    s_min2 = s_min + left_off
+    s_max2 = s_max - right_off
+
+    # corrected length
+    length_corr = np.maximum(np.where(yellow_valid, s_max2 - s_min2, 0).astype(int), 0)
+
+    # rebuild yellow box corners
+    p0 = u * s_min2[:, None] + v * t_min[:, None]
+    p1 = u * s_max2[:, None] + v * t_min[:, None]
+    p2 = u * s_max2[:, None] + v * t_max[:, None]
+    p3 = u * s_min2[:, None] + v * t_max[:, None]
+
+    # for logging: width ~ thickness (same as green width), height_yellow = corrected length
+    return {
+        'width_green':   width_green,
+        'height_green':  height_green,
+        'width_yellow':  np.where(yellow_valid, width_green, 0),
+        'height_yellow': length_corr,
+        'yellow_valid':  yellow_valid,
+        'yellow_box':    np.stack([p0, p1, p2, p3], axis=1),
+    }
+
+
+def draw_boxes(frame, geom, sizes):
+    """Draw green box, yellow box and labels for a one-row geometry array."""
+    if not geom['found'][0]:
+        return
+    box = geom['box'][0].astype(int)
+    height_green  = int(sizes['height_green'][0])
+    height_yellow = int(sizes['height_yellow'][0])
+
+    cv2.polylines(frame, [box], isClosed=True, color=(0, 255, 0), thickness=2)
+    if sizes['yellow_valid'][0]:
+        yellow_box = sizes['yellow_box'][0].astype(int)
+        cv2.polylines(frame, [yellow_box], isClosed=True, color=(0, 255, 255), thickness=2)
+
+    # --- text overlay (show both) ---
+    text_pos = (box[1][0], box[1][1] - 10)
+    cv2.putText(frame, f'Green H: {height_green}px',
+                (text_pos[0], text_pos[1] - 20),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    cv2.putText(frame, f'Yellow H: {height_yellow}px',
+                (text_pos[0], text_pos[1]),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+
+def measure_frame(frame, draw_overlays, roi=None, frame_num=0, scale=None):
+    """Run HSV -> morphology -> minAreaRect -> yellow box on one frame.
+
+    Returns (mask, geom, sizes): the one-row geometry array and the
+    boxes_from_geometry() result for it.
+    Boxes and labels are drawn onto `frame` only if `draw_overlays` is set.
+    Without a `roi`, `scale` > 1 (default PYRAMID_SCALE) finds the window
+    on a downscaled frame first.
+    """
+    if scale is None:
+        scale = PYRAMID_SCALE
+    if roi is None and scale > 1:
+        roi = coarse_roi(frame, scale)
+
+    mask, largest_contour = find_largest_contour(frame, roi)
+    if largest_contour is None and roi is not None:
+        # specimen lost or cut off by the window -> re-acquire on the full frame
+        mask, largest_contour = find_largest_contour(frame)
+
+    t0 = lap_start()
+    rect = None
+    if largest_contour is not None:
         rect = cv2.minAreaRect(largest_contour)
-        box = cv2.boxPoints(rect).astype(int)
 
-        # --- GREEN BOX (full) ---
-        cv2.polylines(frame, [box], isClosed=True, color=(0, 255, 0), thickness=2)
+    geom  = geometry_from_rect(frame_num, rect)
+    sizes = boxes_from_geometry(geom)
+    t0 = lap('geometry', t0)
+
+    if draw_overlays:
+        draw_boxes(frame, geom, sizes)
+        lap('draw', t0)
+
+    return mask, geom, sizes
+
+
+def write_rows(writer_green, writer_yellow, geom, sizes):
+    """Write one CSV row per geometry row to the green and yellow writers."""
+    frames = geom['frame'].tolist()
+    writer_green.writerows(zip(frames, sizes['width_green'].tolist(),
+                               sizes['height_green'].tolist()))
+    writer_yellow.writerows(zip(frames, sizes['width_yellow'].tolist(),
+                                sizes['height_yellow'].tolist()))
+
+
+def validate_pyramid(n_samples):
+    """Print how far coarse-to-fine results deviate from the full-resolution path."""
+    cap = open_video(video_path)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    keys = ('width_green', 'height_green', 'width_yellow', 'height_yellow')
+    diffs = {k: [] for k in keys}
+    for idx in np.unique(np.linspace(0, max(n_frames - 1, 0), n_samples).astype(int)):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        _, _, full   = measure_frame(frame, False, scale=1)
+        _, _, coarse = measure_frame(frame, False, scale=PYRAMID_SCALE)
+        for k in keys:
+            diffs[k].append(int(coarse[k][0]) - int(full[k][0]))
+    cap.release()
+
+    print(f"Coarse-to-fine (1/{PYRAMID_SCALE}) vs full resolution, "
+          f"{len(diffs['height_green'])} frames:")
+    for k in keys:
+        d = np.abs(np.array(diffs[k]))
+        if len(d) == 0:
+            continue
+        print(f"  {k:14s} mean |diff| {d.mean():6.2f} px   max |diff| {d.max():4d} px   "
+              f"identical {np.mean(d == 0) * 100:5.1f} %")
+
+
+class AnnotatedVideoWriter:
+    """Encode frames into one video on a background thread.
+
+    write() blocks when VIDEO_QUEUE_DEPTH frames are waiting, so a slow
+    encoder throttles the tracker instead of growing memory. An error in the
+    encoder thread (e.g. a VIDEO_FOURCC the backend cannot open) is raised
+    again by the next write() or by close().
+    """
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.error = None
+        self.queue = queue.Queue(maxsize=VIDEO_QUEUE_DEPTH)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, frame):
+        self._raise_error()
+        self.queue.put(frame)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"annotated video {self.path} failed") from self.error
+
+    def _run(self):
+        out = None
+        try:
+            while True:
+                frame = self.queue.get()
+                if frame is None:
+                    return
+                if out is None:
+                    h, w = frame.shape[:2]
+                    out = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*VIDEO_FOURCC),
+                                          self.fps, (w, h))
+                    if not out.isOpened():
+                        raise OSError(f"cannot open {self.path} with fourcc {VIDEO_FOURCC!r}")
+                out.write(frame)
+        except Exception as e:
+            self.error = e
+            # keep draining so write() and close() never block on a full queue
+            while self.queue.get() is not None:
+                pass
+        finally:
+            if out is not None:
+                out.release()
+
+
+def open_annotated_writer():
+    """AnnotatedVideoWriter for video_path; plays sampled frames back in real time."""
+    cap = open_video(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return AnnotatedVideoWriter(annotated_video_path, max(fps / ANNOTATE_EVERY_N, 1.0))
+
+
+def validate_mask_engine(n_samples):
+    """Print pixel agreement and speedup of the 'lut' mask vs the 'hsv' mask."""
+    cap = open_video(video_path)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    color_lut(lower_green, upper_green, LUT_BINS)  # don't time the table build
+    agree = []
+    t_hsv = t_lut = 0.0
+    for idx in np.unique(np.linspace(0, max(n_frames - 1, 0), n_samples).astype(int)):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        t0 = time.perf_counter()
+        ref = hsv_mask(frame)
+        t1 = time.perf_counter()
+        fast = lut_mask(frame)
+        t2 = time.perf_counter()
+        t_hsv += t1 - t0
+        t_lut += t2 - t1
+        agree.append(np.mean(ref == fast))
+    cap.release()
+
+    if not agree:
+        return
+    print(f"LUT mask ({LUT_BINS}^3 bins, mask blur {LUT_BLUR_MASK}) vs HSV mask, {len(agree)} frames:")
+    print(f"  pixel agreement mean {np.mean(agree) * 100:.3f} %   min {np.min(agree) * 100:.3f} %")
+    print(f"  mask time hsv {t_hsv / len(agree) * 1e3:.2f} ms   lut {t_lut / len(agree) * 1e3:.2f} ms   "
+          f"speedup {t_hsv / t_lut if t_lut > 0 else 0.0:.2f}x")
+
+
+def save_snapshot(frame, frame_num):
+    snapshot_path = os.path.join(snapshot_dir, f'frame_{frame_num:04d}.jpg')
+    cv2.imwrite(snapshot_path, frame)
+
+
+def open_at(path, start):
+    """Open `path` positioned at frame `start`.
+
+    Falls back to grabbing frames from the beginning if the backend cannot
+    seek frame-accurately, so chunk boundaries never shift.
+    """
+    cap = open_video(path)
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+            cap.release()
+            cap = open_video(path)
+            for _ in range(start):
+                if not cap.grab():
+                    break
+    return cap
+
+
+def track_range(start, stop):
+    """Worker: measure frames [start, stop) (stop=None -> until end of video).
+
+    Returns the geometry array (GEOMETRY_DTYPE) of the range.
+    """
+    cap = open_at(video_path, start)
+    geoms = []
+    roi = None
+    frame_num = start
+    while stop is None or frame_num < stop:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        _, geom, _ = measure_frame(frame, save_snapshots, roi, frame_num)
+        geoms.append(geom)
+
+        if ROI_TRACKING and geom['found'][0]:
+            roi = roi_around(geom['box'][0], frame.shape)
+
+        if save_snapshots:
+            save_snapshot(frame, frame_num)
+
+        frame_num += 1
+    cap.release()
+    return np.concatenate(geoms) if geoms else np.zeros(0, dtype=GEOMETRY_DTYPE)
 
-        w, h = rect[1]
-        # define width/height as shorter/longer side (for logging)
-        if w > h:
-            width_green, height_green = int(h), int(w)
+
+def run_parallel(writer_green, writer_yellow):
+    """Split the video into N_WORKERS frame ranges and merge rows in frame order."""
+    if save_video:
+        print("Note: the annotated video is not written in PARALLEL mode")
+
+    cap = open_video(video_path)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    # frame count from the container can be off by a few frames,
+    # so the last range always runs until the decoder stops
+    n_chunks = max(1, min(N_WORKERS, n_frames))
+    bounds = np.linspace(0, n_frames, n_chunks + 1).astype(int)
+    starts = bounds[:-1].tolist()
+    stops  = bounds[1:].tolist()
+    stops[-1] = None
+
+    with ProcessPoolExecutor(max_workers=n_chunks) as pool:
+        # map() yields results in submission order -> rows stay in frame order
+        geom = np.concatenate(list(pool.map(track_range, starts, stops)))
+
+    write_rows(writer_green, writer_yellow, geom, boxes_from_geometry(geom))
+    return geom
+
+
+def run_pipelined(writer_green, writer_yellow):
+    """Decode, process and write in separate stages connected by bounded queues.
+
+    Always full-frame: an ROI from whichever frame a worker happened to
+    process before would make the results depend on thread scheduling.
+    """
+    if ROI_TRACKING:
+        print("Note: ROI_TRACKING is not used in PIPELINED mode (full-frame search)")
+
+    frame_q  = queue.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+    result_q = queue.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+    # frames decoded but not yet written; also bounds the writer's reorder
+    # buffer when one worker stalls while the others run ahead
+    in_flight = threading.Semaphore(PIPELINE_QUEUE_DEPTH)
+    stop = threading.Event()
+    errors = []
+
+    def decode():
+        cap = open_video(video_path)
+        frame_num = 0
+        try:
+            while not stop.is_set():
+                if not in_flight.acquire(timeout=0.1):
+                    continue  # re-check stop, the writer may be gone
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                # blocks while the queue is full -> back-pressure on the decoder
+                frame_q.put((frame_num, frame))
+                frame_num += 1
+        except Exception as e:
+            errors.append(e)
+        finally:
+            cap.release()
+            for _ in range(PIPELINE_WORKERS):
+                frame_q.put(None)
+
+    def process():
+        try:
+            while True:
+                item = frame_q.get()
+                if item is None:
+                    break
+                frame_num, frame = item
+                if stop.is_set():
+                    continue  # drain so the decoder never blocks forever
+
+                annotate = save_video and frame_num % ANNOTATE_EVERY_N == 0
+                _, geom, sizes = measure_frame(frame, save_snapshots or annotate,
+                                               None, frame_num)
+
+                if save_snapshots:
+                    save_snapshot(frame, frame_num)
+
+                result_q.put((frame_num, geom, sizes, frame if annotate else None))
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            result_q.put(None)
+
+    video_out = open_annotated_writer() if save_video else None
+
+    threads = [threading.Thread(target=decode, daemon=True)]
+    threads += [threading.Thread(target=process, daemon=True) for _ in range(PIPELINE_WORKERS)]
+    for t in threads:
+        t.start()
+
+    # --- writer stage: reorder and emit rows in frame order ---
+    pending = {}
+    geoms = []
+    next_frame = 0
+    workers_done = 0
+    while workers_done < PIPELINE_WORKERS:
+        item = result_q.get()
+        if item is None:
+            workers_done += 1
+            continue
+        pending[item[0]] = item
+        while next_frame in pending:
+            _, geom, sizes, annotated = pending.pop(next_frame)
+            write_rows(writer_green, writer_yellow, geom, sizes)
+            geoms.append(geom)
+            if annotated is not None:
+                video_out.write(annotated)
+            next_frame += 1
+            in_flight.release()
+
+    if video_out is not None:
+        video_out.close()
+
+    if errors:
+        # the decoder may still be blocked on a full queue; it is a daemon
+        stop.set()
+        raise errors[0]
+    for t in threads:
+        t.join()
+
+    return np.concatenate(geoms) if geoms else np.zeros(0, dtype=GEOMETRY_DTYPE)
+
+
+def run_sequential(writer_green, writer_yellow):
+    global _timer
+    headless = HEADLESS
+    _timer = StageTimer() if TIMING else None
+    t_start = time.perf_counter()
+
+    # overlays are only needed for the windows or for snapshots
+    draw_overlays = (not headless) or save_snapshots
+
+    cap = open_video(video_path)
+    if not headless:
+        cv2.namedWindow('Frame', cv2.WINDOW_NORMAL)
+        cv2.namedWindow('Mask',  cv2.WINDOW_NORMAL)
+
+    video_out = open_annotated_writer() if save_video else None
+
+    frame_num = 0
+    roi = None
+    geoms = []
+
+    while True:
+        t0 = lap_start()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        lap('decode', t0)
+
+        annotate = save_video and frame_num % ANNOTATE_EVERY_N == 0
+        mask, geom, sizes = measure_frame(frame, draw_overlays or annotate, roi, frame_num)
+        geoms.append(geom)
+
+        if ROI_TRACKING and geom['found'][0]:
+            roi = roi_around(geom['box'][0], frame.shape)
+
+        # --- write to CSVs ---
+        t0 = lap_start()
+        write_rows(writer_green, writer_yellow, geom, sizes)
+        t0 = lap('csv', t0)
+
+        # --- optional snapshots / annotated video ---
+        if save_snapshots:
+            save_snapshot(frame, frame_num)
+        if annotate:
+            video_out.write(frame)
+        t0 = lap('output', t0)
+
+        frame_num += 1
+
+        if headless:
+            if _timer is not None:
+                _timer.end_frame()
+            continue
+
+        # show windows
+        frame_display = cv2.resize(frame, None, fx=0.5, fy=0.5)
+        mask_display  = cv2.resize(mask,  None, fx=0.5, fy=0.5)
+
+        cv2.imshow('Frame', frame_display)
+        cv2.imshow('Mask',  mask_display)
+
+        key = cv2.waitKey(30) & 0xFF
+        lap('gui', t0)
+        if _timer is not None:
+            _timer.end_frame()
+        if key == 27:  # ESC
+            break
+
+    cap.release()
+    if video_out is not None:
+        video_out.close()
+    if not headless:
+        cv2.destroyAllWindows()
+
+    if _timer is not None:
+        _timer.summary(time.perf_counter() - t_start)
+        if TIMING_CSV:
+            _timer.write_csv(TIMING_CSV)
+            print(f"Per-frame stage timings saved to {TIMING_CSV}")
+        _timer = None
+    return np.concatenate(geoms) if geoms else np.zeros(0, dtype=GEOMETRY_DTYPE)
+
+
+def multi_objects():
+    """[(name, lower, upper, slot)] for every tracked object (MULTI_RANGES x MULTI_K)."""
+    ranges = MULTI_RANGES or [('', lower_green, upper_green)]
+    objects = []
+    for name, lower, upper in ranges:
+        lower = np.asarray(lower)
+        upper = np.asarray(upper)
+        for k in range(MULTI_K):
+            label = f'{name}{k + 1}' if MULTI_K > 1 else (name or '1')
+            objects.append((label, lower, upper, k))
+    return objects
+
+
+def assign_slots(centers, prev_centers):
+    """Slot index per contour center, greedy nearest to the previous centers.
+
+    Slots never seen yet have a NaN center and are filled last, in order.
+    """
+    dist = np.linalg.norm(centers[:, None, :] - prev_centers[None, :, :], axis=2)
+    n_slots = len(prev_centers)
+    slots = [-1] * len(centers)
+    used = set()
+    # argsort puts NaN (empty slots) after every real distance
+    for flat in np.argsort(dist, axis=None, kind='stable'):
+        i, j = divmod(int(flat), n_slots)
+        if slots[i] != -1 or j in used:
+            continue
+        slots[i] = j
+        used.add(j)
+    return slots
+
+
+def measure_objects(frame, frame_num, prev_centers):
+    """Geometry of every multi_objects() entry on one frame (one HSV conversion).
+
+    `prev_centers` is a (n_ranges, MULTI_K, 2) array of last known centers,
+    updated in place. Returns (mask, geom) with one geometry row per object.
+    """
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    hsv = cv2.GaussianBlur(hsv, (5, 5), 0)
+
+    objects = multi_objects()
+    geom = np.zeros(len(objects), dtype=GEOMETRY_DTYPE)
+    geom['frame'] = frame_num
+    combined = None
+
+    for r in range(len(objects) // MULTI_K):
+        _, lower, upper, _ = objects[r * MULTI_K]
+        mask = clean_mask(cv2.inRange(hsv, lower, upper))
+        combined = mask if combined is None else cv2.bitwise_or(combined, mask)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours = sorted(contours, key=cv2.contourArea, reverse=True)[:MULTI_K]
+        if not contours:
+            continue
+        if np.isnan(prev_centers[r]).any() and len(contours) < MULTI_K:
+            # identities not fixed yet: wait for a frame that shows all of them
+            continue
+        rects = [cv2.minAreaRect(c) for c in contours]
+        # left to right on the first full detection, so identities start ordered
+        rects.sort(key=lambda rect: rect[0][0])
+        centers = np.array([rect[0] for rect in rects], dtype=float)
+
+        for rect, slot in zip(rects, assign_slots(centers, prev_centers[r])):
+            geom[r * MULTI_K + slot] = geometry_from_rect(frame_num, rect)[0]
+            prev_centers[r, slot] = rect[0]
+
+    return combined, geom
+
+
+def run_multi(writer):
+    """Track all multi_objects() in one pass; one wide CSV row per frame."""
+    headless = HEADLESS
+    n_objects = len(multi_objects())
+
+    cap = open_video(video_path)
+    if not headless:
+        cv2.namedWindow('Frame', cv2.WINDOW_NORMAL)
+        cv2.namedWindow('Mask',  cv2.WINDOW_NORMAL)
+
+    prev_centers = np.full((n_objects // MULTI_K, MULTI_K, 2), np.nan)
+    frame_num = 0
+    geoms = []
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        mask, geom = measure_objects(frame, frame_num, prev_centers)
+        sizes = boxes_from_geometry(geom)
+        geoms.append(geom)
+
+        row = [frame_num]
+        for i in range(n_objects):
+            row += [int(sizes['width_green'][i]), int(sizes['height_green'][i]),
+                    int(sizes['width_yellow'][i]), int(sizes['height_yellow'][i])]
+        writer.writerow(row)
+
+        if (not headless) or save_snapshots:
+            for i in range(n_objects):
+                draw_boxes(frame, geom[i:i + 1], {k: v[i:i + 1] for k, v in sizes.items()})
+        if save_snapshots:
+            save_snapshot(frame, frame_num)
+
+        frame_num += 1
+
+        if headless:
+            continue
+
+        cv2.imshow('Frame', cv2.resize(frame, None, fx=0.5, fy=0.5))
+        cv2.imshow('Mask',  cv2.resize(mask,  None, fx=0.5, fy=0.5))
+        if cv2.waitKey(30) & 0xFF == 27:  # ESC
+            break
+
+    cap.release()
+    if not headless:
+        cv2.destroyAllWindows()
+
+    names = [name for name, _, _ in MULTI_RANGES] if MULTI_RANGES else ['green']
+    for r in np.flatnonzero(np.isnan(prev_centers).any(axis=(1, 2))):
+        print(f"Note: range {names[r]!r} never showed {MULTI_K} objects at once, "
+              f"its columns are empty")
+    return np.stack(geoms) if geoms else np.zeros((0, n_objects), dtype=GEOMETRY_DTYPE)
+
+
+def track_multi_to_csv(path):
+    """Multi-object run: wide CSV with four columns per object.
+
+    Returns the geometry array with shape (frames, objects).
+    """
+    if save_snapshots and not os.path.exists(snapshot_dir):
+        os.makedirs(snapshot_dir)
+
+    header = ['Frame']
+    for name, _, _, _ in multi_objects():
+        header += [f'Width_green_px_{name}', f'Height_green_px_{name}',
+                   f'Width_yellow_px_{name}', f'Height_yellow_px_{name}']
+
+    with open(path, mode='w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        return run_multi(writer)
+
+
+def save_binary_tables(geom, path_green, path_yellow):
+    """Typed .npy twins of the green/yellow CSVs (see table_io)."""
+    sizes = boxes_from_geometry(geom)
+    table_io.write_binary({'Frame':           geom['frame'],
+                           'Width_green_px':  sizes['width_green'],
+                           'Height_green_px': sizes['height_green']},
+                          path_green, 'green')
+    table_io.write_binary({'Frame':            geom['frame'],
+                           'Width_yellow_px':  sizes['width_yellow'],
+                           'Height_yellow_px': sizes['height_yellow']},
+                          path_yellow, 'yellow')
+
+
+def run_adaptive(writer_green, writer_yellow):
+    """Measure a sparse, adaptively refined subset of frames; interpolate the rest.
+
+    One forward pass: each ADAPTIVE_STEP interval is refined from its buffered
+    frames before the next one is decoded, so every frame is decoded once.
+    Returns the geometry of the measured frames only.
+    """
+    cap = open_video(video_path)
+    measured = {}   # frame index -> (geom, sizes)
+    buf = []        # decoded frames base .. base + len(buf) - 1
+    base = 0
+
+    def measure(idx):
+        if idx not in measured:
+            _, geom, sizes = measure_frame(buf[idx - base], False, None, idx)
+            measured[idx] = (geom, sizes)
+
+    def height(idx):
+        return float(measured[idx][1]['height_yellow'][0])
+
+    def found(idx):
+        return bool(measured[idx][0]['found'][0])
+
+    def probes(a, b):
+        # midpoint and quarter points (these become the next midpoints)
+        m = (a + b) // 2
+        return sorted({(a + m) // 2, m, (m + b) // 2} - {a, b})
+
+    def refine(a, b):
+        # bisect while the probes are not linear within tolerance
+        measure(a)
+        measure(b)
+        intervals = [(a, b)] if b - a > 1 else []
+        while intervals:
+            a, b = intervals.pop()
+            m = (a + b) // 2
+            for i in probes(a, b):
+                measure(i)
+            for i in probes(a, b):
+                interp = height(a) + (height(b) - height(a)) * (i - a) / (b - a)
+                if (abs(height(i) - interp) > ADAPTIVE_TOL_PX or
+                        not (found(a) == found(i) == found(b))):
+                    intervals += [(lo, hi) for lo, hi in ((a, m), (m, b)) if hi - lo > 1]
+                    break
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        buf.append(frame)
+        if len(buf) == ADAPTIVE_STEP + 1:
+            refine(base, base + ADAPTIVE_STEP)
+            # the interval end is the start of the next one
+            base += ADAPTIVE_STEP
+            buf = buf[-1:]
+    if buf:
+        # last (partial) interval, ends at the real last frame
+        refine(base, base + len(buf) - 1)
+    cap.release()
+
+    if not measured:
+        return np.zeros(0, dtype=GEOMETRY_DTYPE)
+
+    # 3) fill the remaining frames by interpolation
+    keys = sorted(measured)
+    geom = np.concatenate([measured[k][0] for k in keys])
+    sizes = boxes_from_geometry(geom)
+    frames = np.arange(keys[-1] + 1)
+    flags = np.isin(frames, keys).astype(int).tolist()
+
+    cols = {}
+    for name in ('width_green', 'height_green', 'width_yellow', 'height_yellow'):
+        cols[name] = np.rint(np.interp(frames, keys, sizes[name])).astype(int).tolist()
+
+    frames = frames.tolist()
+    writer_green.writerows(zip(frames, cols['width_green'], cols['height_green'], flags))
+    writer_yellow.writerows(zip(frames, cols['width_yellow'], cols['height_yellow'], flags))
+
+    share = len(keys) / len(frames) * 100 if frames else 0.0
+    print(f"Adaptive sampling: measured {len(keys)} of {len(frames)} frames "
+          f"({share:.1f} %)")
+    return geom
+
+
+def track_to_csv(path_green, path_yellow):
+    """Track video_path with the current settings and write both CSVs.
+
+    Returns the geometry array (GEOMETRY_DTYPE) of all frames.
+    """
+    if save_snapshots and not os.path.exists(snapshot_dir):
+        os.makedirs(snapshot_dir)
+
+    with open(path_green,  mode='w', newline='') as csv_file_green, \
+         open(path_yellow, mode='w', newline='') as csv_file_yellow:
+        writer_green  = csv.writer(csv_file_green)
+        writer_yellow = csv.writer(csv_file_yellow)
+
+        # adaptive runs flag measured (1) vs interpolated (0) rows
+        extra = ['Measured'] if ADAPTIVE and not FROM_GEOMETRY else []
+        writer_green.writerow(['Frame', 'Width_green_px', 'Height_green_px'] + extra)
+        writer_yellow.writerow(['Frame', 'Width_yellow_px', 'Height_yellow_px'] + extra)
+
+        if FROM_GEOMETRY:
+            # re-apply the current offsets to a saved geometry file, no decoding
+            geom = np.load(geometry_path)
+            if len(geom) and np.any(np.diff(geom['frame']) != 1):
+                raise ValueError(f"{geometry_path} does not hold consecutive frames "
+                                 f"(sparse geometry?), re-run the tracking")
+            write_rows(writer_green, writer_yellow, geom, boxes_from_geometry(geom))
+        elif ADAPTIVE:
+            if TIMING:
+                print("Note: TIMING is only measured in the sequential loop, not with ADAPTIVE")
+            geom = run_adaptive(writer_green, writer_yellow)
+        elif PARALLEL:
+            if TIMING:
+                print("Note: TIMING is only measured in the sequential loop, not in PARALLEL mode")
+            geom = run_parallel(writer_green, writer_yellow)
+        elif PIPELINED:
+            if TIMING:
+                print("Note: TIMING is only measured in the sequential loop, not in PIPELINED mode")
+            geom = run_pipelined(writer_green, writer_yellow)
         else:
-            width_green, height_green = int(w), int(h)
-
-        # --- YELLOW BOX (offset along horizontal / length direction) ---
-        pts = box.tolist()
-        # sort corners by x to get left/right edges
-        pts_sorted_x = sorted(pts, key=lambda p: p[0])
-        left_two  = np.array(pts_sorted_x[:2], dtype=float)
-        right_two = np.array(pts_sorted_x[2:], dtype=float)
-
-        left_center  = left_two.mean(axis=0)
-        right_center = right_two.mean(axis=0)
-
-        vec_lr = right_center - left_center
-        len_lr = np.linalg.norm(vec_lr)
-
-        if len_lr > 1e-6:
-            # unit vector along specimen length (approximately horizontal)
-            u = vec_lr / len_lr
-            # perpendicular direction (thickness)
-            v = np.array([-u[1], u[0]])
-
-            # project original corners to (s,t) coordinates
-            s_vals = []
-            t_vals = []
-            for p in box:
-                p = p.astype(float)
-                s_vals.append(np.dot(p, u))
-                t_vals.append(np.dot(p, v))
-
-            s_min, s_max = min(s_vals), max(s_vals)
-            t_min, t_max = min(t_vals), max(t_vals)
-
-            L0 = s_max - s_min  # original length along u
-
-            left_off  = LEFT_OFFSET_PX
-            right_off = RIGHT_OFFSET_PX
-
-            if left_off + right_off < L0 - 1:
-                s_min2 = s_min + left_off
-                s_max2 = s_max - right_off
-
-                # corrected length
-                length_corr = max(int(s_max2 - s_min2), 0)
-
-                # rebuild yellow box corners
-                p0 = u * s_min2 + v * t_min
-                p1 = u * s_max2 + v * t_min
-                p2 = u * s_max2 + v * t_max
-                p3 = u * s_min2 + v * t_max
-
-                yellow_box = np.array([p0, p1, p2, p3], dtype=int)
-                cv2.polylines(frame, [yellow_box], isClosed=True, color=(0, 255, 255), thickness=2)
-
-                # for logging: width ~ thickness (same as green width), height_yellow = corrected length
-                width_yellow  = width_green
-                height_yellow = length_corr
-            else:
-                # offsets too large – nothing left
-                width_yellow = 0
-                height_yellow = 0
-
-        # --- text overlay (show both) ---
-        text_pos = (box[1][0], box[1][1] - 10)
-        cv2.putText(frame, f'Green H: {height_green}px',
-                    (text_pos[0], text_pos[1] - 20),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        cv2.putText(frame, f'Yellow H: {height_yellow}px',
-                    (text_pos[0], text_pos[1]),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-
-    # --- write to CSVs ---
-    writer_green.writerow([frame_num, width_green, height_green])
-    writer_yellow.writerow([frame_num, width_yellow, height_yellow])
-
-    # --- optional snapshots ---
-    if save_snapshots:
-        snapshot_path = os.path.join(snapshot_dir, f'frame_{frame_num:04d}.jpg')
-        cv2.imwrite(snapshot_path, frame)
+            geom = run_sequential(writer_green, writer_yellow)
+
+    return geom
+
+
+def main_multi():
+    ignored = [name for name, on in (('MASK_ENGINE', MASK_ENGINE != 'hsv'),
+                                     ('ROI_TRACKING', ROI_TRACKING),
+                                     ('PYRAMID_SCALE', PYRAMID_SCALE > 1),
+                                     ('save_video', save_video),
+                                     ('TIMING', TIMING)) if on]
+    if ignored:
+        print(f"Note: {', '.join(ignored)} not supported with MULTI_TRACKING, ignored")
+    t_start = time.perf_counter()
+    geom = track_multi_to_csv(csv_path_multi)
+    elapsed = time.perf_counter() - t_start
 
-    # show windows
-    frame_display = cv2.resize(frame, None, fx=0.5, fy=0.5)
-    mask_display  = cv2.resize(mask,  None, fx=0.5, fy=0.5)
+    if SAVE_GEOMETRY:
+        np.save(multi_geometry_path, geom)
 
-    cv2.imshow('Frame', frame_display)
-    cv2.imshow('Mask',  mask_display)
+    fps = len(geom) / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {len(geom)} frames ({geom.shape[1]} objects) in {elapsed:.1f} s "
+          f"({fps:.1f} frames/s)")
+    print(f"Per-object measurements saved to {csv_path_multi}")
+    if SAVE_GEOMETRY:
+        print(f"Raw box geometry saved to {multi_geometry_path}")
 
-    if cv2.waitKey(30) & 0xFF == 27:  # ESC
-        break
 
-    frame_num += 1
+def main():
+    t_start = time.perf_counter()
+
+    geom = track_to_csv(csv_path_green, csv_path_yellow)
+
+    elapsed = time.perf_counter() - t_start
+    frame_num = len(geom)
+    # adaptive geometry holds the measured frames only
+    total_num = int(geom['frame'][-1]) + 1 if ADAPTIVE and frame_num else frame_num
+
+    if PYRAMID_SCALE > 1 and PYRAMID_VALIDATE_FRAMES > 0 and not FROM_GEOMETRY:
+        validate_pyramid(PYRAMID_VALIDATE_FRAMES)
+    if MASK_ENGINE == 'lut' and LUT_VALIDATE_FRAMES > 0 and not FROM_GEOMETRY:
+        validate_mask_engine(LUT_VALIDATE_FRAMES)
+
+    # (sparse adaptive geometry would break FROM_GEOMETRY, the CSVs stay the reference)
+    if SAVE_GEOMETRY and not (FROM_GEOMETRY or ADAPTIVE):
+        np.save(geometry_path, geom)
+    if table_io.WRITE_BINARY and not ADAPTIVE:
+        save_binary_tables(geom, table_io.binary_path(csv_path_green),
+                           table_io.binary_path(csv_path_yellow))
+
+    fps = frame_num / elapsed if elapsed > 0 else 0.0
+    if ADAPTIVE and not FROM_GEOMETRY:
+        print(f"Processed {frame_num} of {total_num} frames in {elapsed:.1f} s "
+              f"({fps:.1f} measured frames/s)")
+    else:
+        print(f"Processed {frame_num} frames in {elapsed:.1f} s ({fps:.1f} frames/s)")
+    print(f"Green-box measurements saved to {csv_path_green}")
+    print(f"Yellow-box (offset) measurements saved to {csv_path_yellow}")
+    if SAVE_GEOMETRY and not (FROM_GEOMETRY or ADAPTIVE):
+        print(f"Raw box geometry saved to {geometry_path}")
+    if save_snapshots:
+        print(f"Frame images saved to {snapshot_dir}/")
+    if save_video and not (PARALLEL or FROM_GEOMETRY or ADAPTIVE):
+        print(f"Annotated video saved to {annotated_video_path}")
+    elif save_video and ADAPTIVE and not FROM_GEOMETRY:
+        print("Annotated video not written (not supported with ADAPTIVE)")
 
-cap.release()
-cv2.destroyAllWindows()
-csv_file_green.close()
-csv_file_yellow.close()
 
-print(f"Green-box measurements saved to {csv_path_green}")
-print(f"Yellow-box (offset) measurements saved to {csv_path_yellow}")
-if save_snapshots:
-    print(f"Frame images saved to {snapshot_dir}/")
+if __name__ == '__main__':
+    if MULTI_TRACKING:
+        main_multi()
+    else:
+        main()
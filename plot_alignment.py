@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+from table_io import load_table, save_table
+
 # Make text bigger globally
 plt.rcParams.update({
     "font.size": 18,
@@ -16,9 +18,27 @@ PRESSURE_CSV = "test5_pressure.csv"          # timestamp_ms,pressure_kPa
 LENGTH_CSV   = "test5_yellow_length.csv"     # Frame,Height_yellow_px
 FPS          = 30.25
 
+# Alignment: "manual" = match the two values below,
+#            "xcorr"  = automatic, lag with the highest normalized
+#                       cross-correlation of pressure vs. negated length
+#            "drift"  = xcorr lag refined in sliding windows and fitted as a
+#                       time warp (camera clock / FPS drift on long runs)
+ALIGN_MODE           = "manual"
+
 PRESSURE_PEAK_VALUE  = 124.61   # kPa  (first high peak)
 HEIGHT_VALLEY_VALUE  = 1158     # px   (first contraction minimum)
 
+XCORR_DT_S           = 0.05     # s    common resampling grid
+XCORR_MAX_LAG_S      = None     # s    only search |lag| <= this (None = all)
+XCORR_MIN_OVERLAP    = 0.5      # min overlap, fraction of the shorter series
+XCORR_PEAK_EXCL_S    = 2.0      # s    runner-up peak must be this far away
+
+DRIFT_WINDOW_S       = 120.0    # s    window length
+DRIFT_STEP_S         = 30.0     # s    window spacing
+DRIFT_SEARCH_S       = 3.0      # s    search +- this around the global lag
+DRIFT_MIN_NCC        = 0.5      # windows below this are left out of the fit
+DRIFT_FIT            = "linear" # "linear" or "piecewise" (through the windows)
+
 TARGET_P0_KPA        = 75.0
 P0_TOL_KPA           = 1.0
 MIN_P0_SAMPLES       = 10
@@ -28,33 +48,182 @@ MIN_PRESSURE_TOL     = 5.0
 # ============================================================
 
 
+def resample(t, y, dt):
+    """y(t) linearly interpolated onto the grid t[0], t[0] + dt, ... (t sorted)."""
+    grid = np.arange(t[0], t[-1], dt)
+    return grid, np.interp(grid, t, y)
+
+
+def xcorr_full(x, y):
+    """c[k] = sum_n x[n] * y[n + k] for k = -(len(x) - 1) .. len(y) - 1, via FFT."""
+    n = len(x) + len(y) - 1
+    nfft = 1 << (n - 1).bit_length()
+    c = np.fft.irfft(np.conj(np.fft.rfft(x, nfft)) * np.fft.rfft(y, nfft), nfft)
+    return np.concatenate([c[nfft - len(x) + 1:], c[:len(y)]])
+
+
+def xcorr_align(t_p, p, t_L, L, dt=XCORR_DT_S, max_lag_s=XCORR_MAX_LAG_S,
+                min_overlap=XCORR_MIN_OVERLAP):
+    """Offset delta_t (length time - pressure time) from the normalized
+    cross-correlation of pressure against negated length, O(n log n).
+
+    Returns a dict with 'lag_s', 'ncc' (correlation at the lag, -1..1),
+    'margin' (ncc minus the best other peak; small = ambiguous) and the
+    lag-search curve 'lags_s' / 'curve' (NaN where not searched).
+    """
+    gp, xp = resample(t_p, p, dt)
+    gl, yl = resample(t_L, -np.asarray(L, dtype=float), dt)
+    x = (xp - xp.mean()) / xp.std()
+    y = (yl - yl.mean()) / yl.std()
+
+    # normalize by the energy inside the overlap of each lag
+    ones_x, ones_y = np.ones(len(x)), np.ones(len(y))
+    num = xcorr_full(x, y)
+    energy = xcorr_full(x * x, ones_y) * xcorr_full(ones_x, y * y)
+    overlap = np.rint(xcorr_full(ones_x, ones_y))
+    curve = num / np.sqrt(np.maximum(energy, 1e-12))
+
+    lags_s = gl[0] - gp[0] + np.arange(-(len(x) - 1), len(y)) * dt
+    valid = overlap >= min_overlap * min(len(x), len(y))
+    if max_lag_s is not None:
+        valid &= np.abs(lags_s) <= max_lag_s
+    curve[~valid] = np.nan
+
+    best = int(np.nanargmax(curve))
+    # runner-up: best local maximum outside the main peak
+    inner = curve[1:-1]
+    is_peak = np.zeros(len(curve), dtype=bool)
+    is_peak[1:-1] = (inner >= curve[:-2]) & (inner >= curve[2:])
+    others = is_peak & (np.abs(lags_s - lags_s[best]) > XCORR_PEAK_EXCL_S)
+    runner_up = np.nanmax(curve[others]) if others.any() else np.nan
+
+    return {
+        'lag_s':  lags_s[best],
+        'ncc':    curve[best],
+        'margin': curve[best] - runner_up,
+        'lags_s': lags_s,
+        'curve':  curve,
+    }
+
+
+def window_lags(t_p, p, t_L, L, delta0, dt=XCORR_DT_S, window_s=DRIFT_WINDOW_S,
+                step_s=DRIFT_STEP_S, search_s=DRIFT_SEARCH_S):
+    """Local lag within +-search_s of delta0 in sliding windows of pressure time.
+
+    All windows are correlated in one batched FFT. Returns the window centers
+    (pressure time), their lags and NCC (NaN where the length data is missing).
+    """
+    gp, xp = resample(t_p, p, dt)
+    n_win = int(round(window_s / dt))
+    n_search = int(round(search_s / dt))
+    starts = np.arange(0, len(gp) - n_win + 1, max(int(round(step_s / dt)), 1))
+
+    # negated length on the pressure grid shifted by delta0, padded for the search
+    t_ext = gp[0] + delta0 + (np.arange(len(gp) + 2 * n_search) - n_search) * dt
+    yl = np.interp(t_ext, t_L, -np.asarray(L, dtype=float), left=np.nan, right=np.nan)
+
+    x = xp[starts[:, None] + np.arange(n_win)]
+    y = yl[starts[:, None] + np.arange(n_win + 2 * n_search)]
+    x = (x - x.mean(axis=1, keepdims=True)) / x.std(axis=1, keepdims=True)
+    y = (y - y.mean(axis=1, keepdims=True)) / y.std(axis=1, keepdims=True)
+
+    # c[k] = sum_n x[n] * y[n + k], k = 0 .. 2 * n_search (no wrap-around)
+    nfft = 1 << (y.shape[1] - 1).bit_length()
+    c = np.fft.irfft(np.conj(np.fft.rfft(x, nfft, axis=1)) * np.fft.rfft(y, nfft, axis=1),
+                     nfft, axis=1)[:, :2 * n_search + 1]
+    cum = np.concatenate([np.zeros((len(y), 1)), np.cumsum(y * y, axis=1)], axis=1)
+    energy_y = cum[:, n_win:n_win + 2 * n_search + 1] - cum[:, :2 * n_search + 1]
+    ncc = c / np.sqrt(n_win * np.maximum(energy_y, 1e-12))
+
+    rows = np.arange(len(ncc))
+    k = np.argmax(np.nan_to_num(ncc, nan=-np.inf), axis=1)
+    # parabolic sub-sample refinement of the peak
+    km, kp = np.maximum(k - 1, 0), np.minimum(k + 1, ncc.shape[1] - 1)
+    a, b, c0 = ncc[rows, km], ncc[rows, k], ncc[rows, kp]
+    denom = a - 2 * b + c0
+    frac = np.where((k > 0) & (k < ncc.shape[1] - 1) & (denom < 0), 0.5 * (a - c0) / denom, 0.0)
+
+    lags = delta0 + (k + frac - n_search) * dt
+    best = ncc[rows, k]
+    lags[~np.isfinite(best)] = np.nan
+    return gp[starts + n_win // 2], lags, best
+
+
+def fit_warp(centers, lags, ncc, mode=DRIFT_FIT, min_ncc=DRIFT_MIN_NCC):
+    """delta_t as a function of pressure time, fitted to the window lags."""
+    use = np.isfinite(lags) & (ncc >= min_ncc)
+    if use.sum() < 2:
+        raise ValueError(f"only {use.sum()} windows with NCC >= {min_ncc}, cannot fit drift")
+    c, l = centers[use], lags[use]
+
+    if mode == "linear":
+        slope, offset = np.polyfit(c, l, 1, w=ncc[use])
+
+        def delta(t):
+            return offset + slope * np.asarray(t, dtype=float)
+    else:
+        def delta(t):
+            return np.interp(t, c, l)
+
+    return delta
+
+
+def warp_times(t_L, delta, n_iter=5):
+    """Pressure-clock time t_p of length samples, solving t_p = t_L - delta(t_p)."""
+    t_L = np.asarray(t_L, dtype=float)
+    t = t_L - delta(t_L)
+    for _ in range(n_iter):
+        t = t_L - delta(t)
+    return t
+
+
 # ---------- Load pressure ----------
-df_p = pd.read_csv(PRESSURE_CSV)
-df_p["timestamp_ms"] = pd.to_numeric(df_p["timestamp_ms"], errors="coerce")
-df_p["pressure_kPa"] = pd.to_numeric(df_p["pressure_kPa"], errors="coerce")
-df_p = df_p.dropna(subset=["timestamp_ms", "pressure_kPa"])
+# (typed .npy twin is used automatically when present)
+df_p = load_table(PRESSURE_CSV, "pressure")
 df_p["time_s"] = df_p["timestamp_ms"] / 1000.0
 
 # ---------- Load deformation ----------
-df_L = pd.read_csv(LENGTH_CSV)
-df_L["Frame"] = pd.to_numeric(df_L["Frame"], errors="coerce")
-df_L["Height_yellow_px"] = pd.to_numeric(df_L["Height_yellow_px"], errors="coerce")
-df_L = df_L.dropna(subset=["Frame", "Height_yellow_px"])
+df_L = load_table(LENGTH_CSV, "yellow")
 df_L["time_s"] = df_L["Frame"] / FPS
 
 # ============================================================
 # 1) ALIGNMENT
 # ============================================================
 
-peak_idx = (df_p["pressure_kPa"] - PRESSURE_PEAK_VALUE).abs().idxmin()
-t_peak   = df_p.loc[peak_idx, "time_s"]
+if ALIGN_MODE in ("xcorr", "drift"):
+    p_sorted = df_p.sort_values("time_s")
+    L_sorted = df_L.sort_values("time_s")
+    xcorr = xcorr_align(p_sorted["time_s"].values, p_sorted["pressure_kPa"].values,
+                        L_sorted["time_s"].values, L_sorted["Height_yellow_px"].values)
+    delta_t = xcorr["lag_s"]
+    print(f"Cross-correlation lag: {delta_t:.3f} s  "
+          f"(NCC {xcorr['ncc']:.3f}, margin to next peak {xcorr['margin']:.3f})")
+else:
+    peak_idx = (df_p["pressure_kPa"] - PRESSURE_PEAK_VALUE).abs().idxmin()
+    t_peak   = df_p.loc[peak_idx, "time_s"]
+
+    valley_idx = (df_L["Height_yellow_px"] - HEIGHT_VALLEY_VALUE).abs().idxmin()
+    t_valley   = df_L.loc[valley_idx, "time_s"]
 
-valley_idx = (df_L["Height_yellow_px"] - HEIGHT_VALLEY_VALUE).abs().idxmin()
-t_valley   = df_L.loc[valley_idx, "time_s"]
+    delta_t = t_valley - t_peak
 
-delta_t = t_valley - t_peak
 df_L["time_aligned_s"] = df_L["time_s"] - delta_t
 
+if ALIGN_MODE == "drift":
+    centers, win_lags, win_ncc = window_lags(
+        p_sorted["time_s"].values, p_sorted["pressure_kPa"].values,
+        L_sorted["time_s"].values, L_sorted["Height_yellow_px"].values, delta_t)
+    delta_fn = fit_warp(centers, win_lags, win_ncc)
+    df_L["time_aligned_s"] = warp_times(df_L["time_s"].values, delta_fn)
+
+    residual = win_lags - delta_fn(centers)
+    print(f"Drift ({DRIFT_FIT}): lag {delta_fn(centers[0]):.3f} s -> "
+          f"{delta_fn(centers[-1]):.3f} s over {centers[-1] - centers[0]:.0f} s")
+    print("  window center [s]   lag [s]   NCC    residual [ms]")
+    for c, l, q, r in zip(centers, win_lags, win_ncc, residual):
+        used = "" if q >= DRIFT_MIN_NCC else "   (not used)"
+        print(f"  {c:17.1f} {l:9.3f} {q:6.3f} {r * 1000:12.1f}{used}")
+
 # ============================================================
 # 2) Compute compression (%)
 # ============================================================
@@ -122,9 +291,42 @@ aligned_df = pd.DataFrame({
 })
 
 OUTFILE = PRESSURE_CSV.replace("_pressure.csv", "_aligned.csv")
-aligned_df.to_csv(OUTFILE, index=False)
+save_table(aligned_df, OUTFILE, "aligned")
 print(f"\nSaved aligned compression+pressure CSV → {OUTFILE}\n")
 
+# ============================================================
+# 5a) PLOT 0 – Lag search curve (xcorr mode)
+# ============================================================
+if ALIGN_MODE == "xcorr":
+    plt.figure(figsize=(12, 4))
+    plt.plot(xcorr["lags_s"], xcorr["curve"], lw=1.0, color="gray")
+    plt.axvline(delta_t, color="crimson", ls="--", label=f"lag = {delta_t:.2f} s")
+    plt.xlabel("Lag (length - pressure) [s]")
+    plt.ylabel("Normalized cross-correlation")
+    plt.title("Alignment Lag Search")
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.show()
+
+# ============================================================
+# 5b) PLOT 0b – Lag drift and residuals (drift mode)
+# ============================================================
+if ALIGN_MODE == "drift":
+    fig, (ax_lag, ax_res) = plt.subplots(2, 1, figsize=(12, 6), sharex=True)
+    ax_lag.plot(centers, win_lags, "o", color="gray", label="window lag")
+    ax_lag.plot(centers, delta_fn(centers), color="crimson", label=f"{DRIFT_FIT} warp")
+    ax_lag.set_ylabel("Lag [s]")
+    ax_lag.legend()
+    ax_lag.grid(True, alpha=0.3)
+    ax_res.plot(centers, residual * 1000, "o-", color="steelblue")
+    ax_res.set_xlabel("Pressure time [s]")
+    ax_res.set_ylabel("Residual [ms]")
+    ax_res.grid(True, alpha=0.3)
+    fig.suptitle("Clock Drift Between Camera and Pressure Log")
+    plt.tight_layout()
+    plt.show()
+
 # ============================================================
 # 5) PLOT 1 – Pressure vs time
 # ============================================================
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+from table_io import load_table, save_table
+
 # ===== Plot style =====
 plt.rcParams.update({
     "font.size": 18,
@@ -224,7 +226,7 @@ for csv_path, params in SPECIMENS:
     display_name = DISPLAY_NAMES.get(csv_path, csv_path)
     print(f"\n=== Processing {csv_path} ({display_name}) ===")
 
-    df = pd.read_csv(csv_path)
+    df = load_table(csv_path, "aligned")
 
     t = df["time_s"].to_numpy()
     p = df["pressure_kPa"].to_numpy()
@@ -288,7 +290,7 @@ slope_rows  = []   # for export of slopes / specimen info
 for csv_path, params in SPECIMENS:
     display_name = DISPLAY_NAMES.get(csv_path, csv_path)
 
-    df = pd.read_csv(csv_path)
+    df = load_table(csv_path, "aligned")
     t = df["time_s"].to_numpy()
     p = df["pressure_kPa"].to_numpy()
     c = df["compression_pct"].to_numpy()
@@ -340,7 +342,7 @@ for csv_path, params in SPECIMENS:
 
 # Save combined compression–pressure data
 df_export = pd.DataFrame(global_rows)
-df_export.to_csv("kresling_pressure_compression_export.csv", index=False)
+save_table(df_export, "kresling_pressure_compression_export.csv", "export")
 print("Exported: kresling_pressure_compression_export.csv")
 
 # Save slopes for each specimen
@@ -2,7 +2,8 @@ import csv
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter, MaxNLocator
-import pandas as pd
+
+from table_io import load_table, save_table
 
 csv_path = "finaltest_12floors_new_boxing_yellow.csv"
 
@@ -13,7 +14,7 @@ OUTFILE = "finaltest_12floors_new_yellow_length.csv"   # <-- trimmed CSV output
 
 
 # === Load original CSV ===
-df = pd.read_csv(csv_path)
+df = load_table(csv_path, "yellow")
 
 frames = df["Frame"].to_numpy()
 heights_px = df["Height_yellow_px"].to_numpy()
@@ -28,7 +29,7 @@ mask = times_s >= TRIM_START_S
 df_trimmed = df[mask].reset_index(drop=True)
 
 # === Save trimmed CSV with ORIGINAL formatting ===
-df_trimmed.to_csv(OUTFILE, index=False)
+save_table(df_trimmed, OUTFILE, "yellow")
 print(f"Trimmed CSV saved to: {OUTFILE}")
 
 # === Plot (using trimmed data only) ===
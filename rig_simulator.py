@@ -0,0 +1,266 @@
+# Simulated cyclic_pressure_test.ino rig on a Linux pty, for exercising
+# log_pressure_delay.py without the Arduino (set its PORT to SIM_LINK).
+# Same 's'/'x' commands, staged P_low/P_high bands, CYCLES_PER_STAGE counting
+# and telemetry line format as the firmware; pressure follows the syringe
+# position linearly plus gaussian noise. Lower PRINT_INTERVAL_MS to stress
+# the logger: lines that don't fit into the pty buffer are dropped, like a
+# UART overrun, and counted. 'b' switches to binary telemetry frames like the
+# firmware; CORRUPT_PROB flips random bytes to exercise the resync.
+import os
+import select
+import time
+import tty
+
+import numpy as np
+
+from log_pressure_delay import FRAME_DTYPE, encode_frames
+
+SIM_LINK          = "/tmp/rig_sim"  # symlink to the pty (None = just print its path)
+PRINT_INTERVAL_MS = 150.0   # firmware: 150 ms; 15 or 1.5 for 10x / 100x the line rate
+TIME_SCALE        = 1.0     # simulated seconds per wall-clock second (faster cycles)
+NOISE_KPA         = 0.3     # std of the gaussian pressure noise
+PHYSICS_DT_MS     = 10.0    # max simulated time between state machine updates
+STATS_SEC         = 5.0     # print emitted/dropped lines and lines/s this often
+SEED              = 0
+MAX_BATCH         = 5000    # lines / frames generated per pty write while catching up
+
+# Binary telemetry ('b' command, see TELEMETRY in log_pressure_delay.py)
+BIN_PRINT_INTERVAL_MS = 20.0   # firmware: 20 ms
+CORRUPT_PROB          = 0.0    # per-byte probability of a bit flip on the wire
+
+# ---- Rig model ----
+P_AMBIENT_KPA = 101.3
+KPA_PER_STEP  = 0.2        # pressure change per microstep of the syringe
+
+# ---- Firmware constants (cyclic_pressure_test.ino) ----
+SPEED_UP         = 25.0
+SPEED_DOWN       = -25.0
+MARGIN_KPA       = 2.0
+CYCLES_PER_STAGE = 10
+NUM_STAGES       = 6
+P_LOW_BASE_KPA   = 75.0
+P_HIGH_START_KPA = 125.0
+P_HIGH_STEP_KPA  = 25.0
+P_HIGH_MAX_KPA   = 300.0
+
+STATE_NAMES = {"HOLD": "HOLD", "GOING_UP": "UP", "GOING_DOWN": "DOWN"}
+STATE_ENUM  = {"HOLD": 0, "GOING_UP": 1, "GOING_DOWN": 2}
+
+
+class RigSim:
+    """State machine of cyclic_pressure_test.ino driving a linear syringe model."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.steps = 0.0       # physical syringe position
+        self.pos_zero = 0.0    # setCurrentPosition(0) at test start
+        self.speed = 0.0
+        self.state = "HOLD"
+        self.running = False
+        self.stage = 0
+        self.cycles = 0
+        self.high_reached = False
+        self.p_init = 0.0
+        self.p_low = 0.0
+        self.p_high = 0.0
+        self.p = P_AMBIENT_KPA
+        self.binary = False
+        self.seq = 0
+        self.t_ms = 0.0
+        self.out = []   # pending output, one item per line / frame
+        self.info("TB6600 + AccelStepper continuous cyclic rig ready.")
+        self.info("Send 's' to start, 'x' to stop.")
+
+    def info(self, text):
+        self.out.append(text.encode() + b"\r\n")
+
+    def read_pressure(self):
+        p = P_AMBIENT_KPA + self.steps * KPA_PER_STEP + self.rng.normal(0.0, NOISE_KPA)
+        return max(p, 0.0)
+
+    def stop(self):
+        self.running = False
+        self.speed = 0.0
+        self.state = "HOLD"
+
+    def update_bands(self):
+        if self.stage >= NUM_STAGES:
+            self.info("All stages already completed.")
+            self.stop()
+            return
+        self.p_low = P_LOW_BASE_KPA
+        self.p_high = min(P_HIGH_START_KPA + self.stage * P_HIGH_STEP_KPA, P_HIGH_MAX_KPA)
+        self.info(f"Stage {self.stage}: P_low={self.p_low:.1f}  P_high={self.p_high:.1f}")
+
+    def start(self):
+        self.p_init = float(np.mean([self.read_pressure() for _ in range(50)]))
+        self.stage = 0
+        self.cycles = 0
+        self.high_reached = False
+        self.pos_zero = self.steps
+        self.update_bands()
+        self.state = "GOING_UP"
+        self.running = True
+        self.speed = SPEED_UP
+        self.info(f"Test started. Ambient P_init={self.p_init:.2f} kPa")
+
+    def command(self, c):
+        if c in "sS" and not self.running:
+            self.start()
+        elif c in "xX":
+            self.stop()
+            self.info("Test stopped.")
+        elif c in "bB":
+            self.binary = True
+        elif c in "aA":
+            self.binary = False
+
+    def step(self, dt):
+        """Move the syringe for dt simulated seconds, then run the state machine."""
+        self.t_ms += dt * 1000.0
+        self.steps += self.speed * dt
+        p = self.p = self.read_pressure()
+        if not self.running:
+            return
+
+        if self.state == "GOING_UP":
+            if p >= self.p_high - MARGIN_KPA:
+                self.high_reached = True
+                self.state = "GOING_DOWN"
+                self.speed = SPEED_DOWN
+
+        elif self.state == "GOING_DOWN":
+            if p <= self.p_low + MARGIN_KPA:
+                if self.high_reached:
+                    self.cycles += 1
+                    self.high_reached = False
+                    self.info(f"Cycle {self.cycles} complete.")
+
+                    if self.cycles % CYCLES_PER_STAGE == 0:
+                        self.stage += 1
+                        if self.stage < NUM_STAGES:
+                            self.update_bands()
+                        else:
+                            self.info("All stages complete. Test stopped.")
+                            self.stop()
+                if self.running:
+                    self.state = "GOING_UP"
+                    self.speed = SPEED_UP
+
+    def print_telemetry(self):
+        if self.binary:
+            # FRAME_DTYPE fields; sync and CRC are filled in by take_output()
+            self.out.append((0, self.seq, int(self.t_ms) & 0xFFFFFFFF, self.p,
+                             self.p_low, self.p_high, int(self.steps - self.pos_zero),
+                             STATE_ENUM[self.state], self.stage, self.cycles,
+                             int(self.running), 0))
+            self.seq = (self.seq + 1) & 0xFFFF
+            return
+        self.info(
+            f"P={self.p:.2f},P_init={self.p_init:.2f},P_low={self.p_low:.2f},"
+            f"P_high={self.p_high:.2f},posSteps={int(self.steps - self.pos_zero)},"
+            f"state={STATE_NAMES[self.state]},stage={self.stage},"
+            f"cycles={self.cycles},running={int(self.running)}")
+
+    def take_output(self):
+        """Pending output as bytes and the end offset of every line / frame."""
+        frames = [i for i, item in enumerate(self.out) if isinstance(item, tuple)]
+        if frames:
+            # encode all pending frames at once (vectorized CRC)
+            raw = encode_frames([self.out[i] for i in frames])
+            size = FRAME_DTYPE.itemsize
+            for k, i in enumerate(frames):
+                self.out[i] = raw[k * size:(k + 1) * size]
+        ends = np.cumsum([len(item) for item in self.out], dtype=np.int64)
+        data = b"".join(self.out)
+        self.out.clear()
+        return data, ends
+
+
+def open_pty():
+    """Raw pty pair (master, slave path); SIM_LINK points at the slave."""
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)
+    path = os.ttyname(slave)
+    if SIM_LINK:
+        if os.path.islink(SIM_LINK):
+            os.remove(SIM_LINK)
+        os.symlink(path, SIM_LINK)
+    return master, slave, path
+
+
+def corrupt(data, rng):
+    """Flip one random bit in a CORRUPT_PROB fraction of the bytes."""
+    arr = np.frombuffer(data, dtype=np.uint8).copy()
+    hit = np.flatnonzero(rng.random(len(arr)) < CORRUPT_PROB)
+    arr[hit] ^= (1 << rng.integers(0, 8, len(hit))).astype(np.uint8)
+    return arr.tobytes()
+
+
+def run(master):
+    rng = np.random.default_rng(SEED)
+    sim = RigSim(rng)
+
+    t_sim = 0.0
+    wall0 = last_stats = time.monotonic()
+    emitted = dropped = 0
+    last_emitted = 0
+
+    while True:
+        # ---- Serial commands ----
+        if select.select([master], [], [], 0)[0]:
+            for c in os.read(master, 1024).decode(errors="replace"):
+                sim.command(c)
+
+        # ---- Catch up with the wall clock (scaled) ----
+        interval = (BIN_PRINT_INTERVAL_MS if sim.binary else PRINT_INTERVAL_MS) / 1000.0
+        n_sub = max(1, int(np.ceil(interval * 1000.0 / PHYSICS_DT_MS)))
+        target = (time.monotonic() - wall0) * TIME_SCALE
+        n_due = 0
+        while t_sim + interval <= target and n_due < MAX_BATCH:
+            n_due += 1
+            for _ in range(n_sub):
+                sim.step(interval / n_sub)
+            sim.print_telemetry()
+            t_sim += interval
+
+        data, ends = sim.take_output()
+        if data:
+            if CORRUPT_PROB > 0:
+                data = corrupt(data, rng)
+            try:
+                written = os.write(master, data)
+            except BlockingIOError:
+                written = 0
+            # whatever did not fit is lost (a cut line / frame arrives malformed)
+            emitted += len(ends)
+            dropped += len(ends) - int(np.searchsorted(ends, written, side="right"))
+
+        now = time.monotonic()
+        if now - last_stats >= STATS_SEC:
+            rate = (emitted - last_emitted) / (now - last_stats)
+            print(f"[sim] {emitted} lines ({rate:.0f} lines/s), {dropped} dropped, "
+                  f"stage {sim.stage}, cycles {sim.cycles}, state {STATE_NAMES[sim.state]}")
+            last_stats, last_emitted = now, emitted
+
+        time.sleep(min(interval / TIME_SCALE, 0.005))
+
+
+def main():
+    master, slave, path = open_pty()
+    print(f"Simulated rig on {path}" + (f" ({SIM_LINK})" if SIM_LINK else ""))
+    print(f"{1000.0 / PRINT_INTERVAL_MS * TIME_SCALE:.0f} lines/s, noise {NOISE_KPA} kPa; Ctrl+C to quit")
+    try:
+        run(master)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        os.close(slave)
+        if SIM_LINK and os.path.islink(SIM_LINK):
+            os.remove(SIM_LINK)
+
+
+if __name__ == "__main__":
+    main()
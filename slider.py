@@ -1,9 +1,19 @@
 import cv2
 import numpy as np
+from collections import OrderedDict
 
-video_path = 'VID_0079.mp4'
+from frame_store import open_video
+from object_boxing_offset import boxes_from_geometry, geometry_from_rect
 
-cap = cv2.VideoCapture(video_path)
+video_path = 'VID_0079.mp4'   # or a decoded frame store (frame_store.py)
+
+# decoded frames + blurred HSV kept in memory (LRU), so moving a slider
+# only recomputes mask and boxes for the current frame; the number of cached
+# frames follows from this budget and the frame size (at least one)
+CACHE_MB = 512
+
+cap = open_video(video_path)
+n_frames = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 1)
 
 cv2.namedWindow('Frame', cv2.WINDOW_NORMAL)
 cv2.namedWindow('Mask', cv2.WINDOW_NORMAL)
@@ -27,14 +37,50 @@ cv2.createTrackbar('Erode', 'Controls', 0, 3, nothing)
 cv2.createTrackbar('Left_off',  'Controls', 0, 300, nothing)
 cv2.createTrackbar('Right_off', 'Controls', 0, 300, nothing)
 
-while True:
+# frame scrubber
+cv2.createTrackbar('Frame', 'Controls', 0, n_frames - 1, nothing)
+
+cache = OrderedDict()   # frame index -> (frame, blurred hsv)
+cache_frames = None     # set from the first frame's size
+next_read = 0           # index cap.read() returns next (no seek needed)
+
+
+def load_frame(idx):
+    """Decoded frame and blurred HSV for frame `idx` (None past the end)."""
+    global next_read, cache_frames
+    if idx in cache:
+        cache.move_to_end(idx)
+        return cache[idx]
+
+    if idx != next_read:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
     ret, frame = cap.read()
     if not ret:
-        break
+        next_read = -1
+        return None
+    next_read = idx + 1
 
     hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
     hsv = cv2.GaussianBlur(hsv, (5, 5), 0)
 
+    if cache_frames is None:
+        cache_frames = max(CACHE_MB * 1024 * 1024 // (frame.nbytes + hsv.nbytes), 1)
+        print(f"Frame cache: {cache_frames} frames ({CACHE_MB} MB)")
+
+    cache[idx] = (frame, hsv)
+    if len(cache) > cache_frames:
+        cache.popitem(last=False)
+    return cache[idx]
+
+
+print("SPACE = play/pause, a/d = step back/forward, ESC = quit")
+
+playing = True
+last_state = None
+
+while True:
+    idx = cv2.getTrackbarPos('Frame', 'Controls')
+
     # read sliders
     h_min = cv2.getTrackbarPos('H_min', 'Controls')
     h_max = cv2.getTrackbarPos('H_max', 'Controls')
@@ -47,6 +93,42 @@ while True:
     left_off  = cv2.getTrackbarPos('Left_off',  'Controls')
     right_off = cv2.getTrackbarPos('Right_off', 'Controls')
 
+    key = cv2.waitKey(30) & 0xFF
+    if key == 27:  # ESC
+        break
+    elif key == ord(' '):
+        playing = not playing
+    elif key == ord('a'):
+        playing = False
+        idx = max(idx - 1, 0)
+    elif key == ord('d'):
+        playing = False
+        idx = min(idx + 1, n_frames - 1)
+    elif playing and last_state is not None and last_state[0] == idx:
+        # advance only once the current frame has been shown
+        idx += 1
+        if idx >= n_frames:
+            # stay on the last frame instead of exiting
+            idx = n_frames - 1
+            playing = False
+    cv2.setTrackbarPos('Frame', 'Controls', idx)
+
+    # nothing changed -> nothing to recompute
+    state = (idx, h_min, h_max, s_min, s_max, v_min, v_max, erode_iter, left_off, right_off)
+    if state == last_state:
+        continue
+    last_state = state
+
+    loaded = load_frame(idx)
+    if loaded is None:
+        # container frame count was too high -> clamp scrubber to real end
+        n_frames = max(idx, 1)
+        cv2.setTrackbarMax('Frame', 'Controls', n_frames - 1)
+        playing = False
+        continue
+    frame, hsv = loaded
+    frame = frame.copy()  # keep the cached frame free of overlays
+
     lower_green = np.array([h_min, s_min, v_min])
     upper_green = np.array([h_max, s_max, v_max])
 
@@ -68,75 +150,30 @@ while True:
         # draw original min-area box (green)
         cv2.polylines(frame, [box], isClosed=True, color=(0, 255, 0), thickness=2)
 
-        # width/height = shorter/longer side of rect (just for info)
-        w, h = rect[1]
-        if w > h:
-            width, height = int(h), int(w)
-        else:
-            width, height = int(w), int(h)
-
-        # ---------- Build yellow box trimmed LEFT/RIGHT (horizontal) ----------
-        # 1) Get left/right edge midpoints to define horizontal axis
-        pts = box.tolist()
-        pts_sorted_x = sorted(pts, key=lambda p: p[0])  # sort by x
-        left_two  = np.array(pts_sorted_x[:2], dtype=float)
-        right_two = np.array(pts_sorted_x[2:], dtype=float)
-
-        left_center = left_two.mean(axis=0)
-        right_center = right_two.mean(axis=0)
-
-        vec_lr = right_center - left_center
-        len_lr = np.linalg.norm(vec_lr)
-
-        if len_lr > 1e-6:
-            # unit vector along length (horizontal-ish) and its perpendicular
-            u = vec_lr / len_lr
-            v = np.array([-u[1], u[0]])  # perpendicular
-
-            # 2) Project original box corners to (s,t) coordinates
-            s_vals = []
-            t_vals = []
-            for p in box:
-                p = p.astype(float)
-                s_vals.append(np.dot(p, u))
-                t_vals.append(np.dot(p, v))
-
-            s_min, s_max = min(s_vals), max(s_vals)
-            t_min, t_max = min(t_vals), max(t_vals)
-
-            L0 = s_max - s_min  # full length along u
-
-            # 3) Apply offsets along length
-            if left_off + right_off < L0 - 1:  # ensure something remains
-                s_min2 = s_min + left_off
-                s_max2 = s_max - right_off
-
-                # corrected effective length
-                length_corr = int(s_max2 - s_min2)
-                if length_corr < 0:
-                    length_corr = 0
-
-                # 4) Rebuild yellow box corners from (s,t)
-                p0 = u * s_min2 + v * t_min
-                p1 = u * s_max2 + v * t_min
-                p2 = u * s_max2 + v * t_max
-                p3 = u * s_min2 + v * t_max
-
-                yellow_box = np.array([p0, p1, p2, p3], dtype=int)
-                cv2.polylines(frame, [yellow_box], isClosed=True, color=(0, 255, 255), thickness=2)
-
-                # Label (using corrected length as "Height corr" since that's your specimen length)
-                text_pos = (box[1][0], box[1][1] - 10)
-                cv2.putText(frame,
-                            f'Width: {width}px',
-                            (text_pos[0], text_pos[1] - 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6,
-                            (255, 255, 255), 2)
-                cv2.putText(frame,
-                            f'Height corr: {length_corr}px',
-                            (text_pos[0], text_pos[1] + 5),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6,
-                            (0, 255, 255), 2)
+        # width/height = shorter/longer side, yellow box trimmed LEFT/RIGHT
+        # (same vectorized geometry as the tracker)
+        geom = geometry_from_rect(0, rect)
+        sizes = boxes_from_geometry(geom, left_off, right_off)
+        width = int(sizes['width_green'][0])
+
+        if sizes['yellow_valid'][0]:  # ensure something remains
+            length_corr = int(sizes['height_yellow'][0])
+
+            yellow_box = sizes['yellow_box'][0].astype(int)
+            cv2.polylines(frame, [yellow_box], isClosed=True, color=(0, 255, 255), thickness=2)
+
+            # Label (using corrected length as "Height corr" since that's your specimen length)
+            text_pos = (box[1][0], box[1][1] - 10)
+            cv2.putText(frame,
+                        f'Width: {width}px',
+                        (text_pos[0], text_pos[1] - 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6,
+                        (255, 255, 255), 2)
+            cv2.putText(frame,
+                        f'Height corr: {length_corr}px',
+                        (text_pos[0], text_pos[1] + 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6,
+                        (0, 255, 255), 2)
 
     # show smaller windows
     frame_display = cv2.resize(frame, None, fx=0.5, fy=0.5)
@@ -145,8 +182,5 @@ while True:
     cv2.imshow('Frame', frame_display)
     cv2.imshow('Mask', mask_display)
 
-    if cv2.waitKey(30) & 0xFF == 27:  # ESC
-        break
-
 cap.release()
 cv2.destroyAllWindows()
@@ -1,7 +1,8 @@
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+from table_io import load_table
+
 # ============================================================
 # USER INPUTS — fill these values for your specimens
 # ============================================================
@@ -31,7 +32,7 @@ GEOM = {
 # Load exported data (from your global compression plot)
 # ============================================================
 
-df = pd.read_csv("kresling_pressure_compression_export.csv")
+df = load_table("kresling_pressure_compression_export.csv", "export")
 
 specimens = df["specimen"].unique()
 
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Typed binary tables for handing data between the pipeline scripts.
+#
+# Every table is still written as CSV (for humans); with WRITE_BINARY a .npy
+# file with the same stem and a fixed structured dtype is written next to it.
+# load_table() prefers that .npy (memory-mapped, no parsing) whenever it is
+# at least as new as the CSV, and falls back to parsing the CSV otherwise.
+# The compact dtypes are for disk only: load_table() hands back int64/float64
+# columns so consumers can do arithmetic without overflowing an int16.
+WRITE_BINARY = True
+
+SCHEMAS = {
+    # object_boxing_offset.py / rel_length_plotter.py
+    'green':    [('Frame', '<i4'), ('Width_green_px', '<i2'), ('Height_green_px', '<i2')],
+    'yellow':   [('Frame', '<i4'), ('Width_yellow_px', '<i2'), ('Height_yellow_px', '<i2')],
+    # log_pressure_delay.py
+    'pressure': [('timestamp_ms', '<i8'), ('pressure_kPa', '<f4')],
+    # log_pressure_delay.py, CAPTURE = "full" (state: 0 HOLD, 1 UP, 2 DOWN)
+    'telemetry': [('timestamp_ms', '<i8'), ('pressure_kPa', '<f4'), ('P_init_kPa', '<f4'),
+                  ('P_low_kPa', '<f4'), ('P_high_kPa', '<f4'), ('posSteps', '<i4'),
+                  ('state', '<i1'), ('stage', '<i1'), ('cycles', '<i2'), ('running', '<i1')],
+    # log_pressure_delay.py, TELEMETRY = "binary" (host time + firmware frame fields)
+    'frames':   [('timestamp_ms', '<i8'), ('device_ms', '<u4'), ('seq', '<u2'),
+                 ('pressure_kPa', '<f4'), ('P_low_kPa', '<f4'), ('P_high_kPa', '<f4'),
+                 ('posSteps', '<i4'), ('state', '<i1'), ('stage', '<i1'), ('cycles', '<i2'),
+                 ('running', '<i1')],
+    'cycles':   [('cycles', '<i2'), ('stage', '<i1'), ('start_ms', '<i8'),
+                 ('P_low_kPa', '<f4'), ('P_high_kPa', '<f4')],
+    # cycle_detection.py (live cycle table of log_pressure_delay.py)
+    'pressure_cycles': [('cycle', '<i4'), ('start_s', '<f8'), ('end_s', '<f8'),
+                        ('p_min_kPa', '<f4'), ('p_max_kPa', '<f4'), ('peak_s', '<f8')],
+    # plot_alignment.py
+    'aligned':  [('time_s', '<f8'), ('pressure_kPa', '<f4'), ('compression_pct', '<f4')],
+    # pressure-compression-plot.py
+    'export':   [('specimen', '<U64'), ('compression_pct', '<f4'), ('pressure_kPa', '<f4')],
+}
+
+
+def binary_path(csv_path):
+    """The .npy file that goes with `csv_path`."""
+    return os.path.splitext(csv_path)[0] + '.npy'
+
+
+def to_records(columns, schema):
+    """Structured array with the schema's dtype from a DataFrame or dict of columns."""
+    dtype = np.dtype(SCHEMAS[schema])
+    n = len(columns[dtype.names[0]])
+    rec = np.empty(n, dtype=dtype)
+    for name in dtype.names:
+        rec[name] = _checked(np.asarray(columns[name]), dtype[name], name, schema)
+    return rec
+
+
+def _checked(values, dt, name, schema):
+    """`values` unchanged if they fit `dt`; raises instead of truncating/wrapping."""
+    if dt.kind == 'U':
+        longest = max((len(str(v)) for v in values), default=0)
+        if longest > dt.itemsize // 4:
+            raise ValueError(f"{schema}.{name}: string of length {longest} does not "
+                             f"fit {dt.str}")
+    elif dt.kind in 'iu' and values.size and not np.can_cast(values.dtype, dt):
+        if values.dtype.kind == 'f' and not np.all(np.isfinite(values)):
+            raise ValueError(f"{schema}.{name}: non-finite value for {dt.str}")
+        info = np.iinfo(dt)
+        lo, hi = values.min(), values.max()
+        if lo < info.min or hi > info.max:
+            raise ValueError(f"{schema}.{name}: values in [{lo}, {hi}] do not fit {dt.str}")
+    return values
+
+
+def write_binary(columns, path, schema):
+    """Write columns as a schema-typed .npy (`path` may be an open binary file)."""
+    rec = to_records(columns, schema)
+    if isinstance(path, str):
+        with open(path, 'wb') as f:
+            np.save(f, rec)
+    else:
+        np.save(path, rec)
+
+
+def save_table(df, csv_path, schema):
+    """Write `df` to csv_path and, with WRITE_BINARY, its typed .npy twin."""
+    df.to_csv(csv_path, index=False)
+    # binary last, so it is never older than the CSV it mirrors
+    if WRITE_BINARY:
+        write_binary(df, binary_path(csv_path), schema)
+
+
+def csv_to_binary(csv_path, schema):
+    """Convert an existing CSV (e.g. from the logger) to its .npy twin."""
+    df = read_csv_typed(csv_path, schema)
+    write_binary(df, binary_path(csv_path), schema)
+
+
+def read_csv_typed(csv_path, schema):
+    """Parse a CSV, coercing schema columns and dropping rows that don't parse."""
+    df = pd.read_csv(csv_path)
+    numeric = [name for name, dt in SCHEMAS[schema] if np.dtype(dt).kind in 'iuf']
+    for name in numeric:
+        df[name] = pd.to_numeric(df[name], errors='coerce')
+    return df.dropna(subset=numeric).reset_index(drop=True)
+
+
+def load_table(path, schema):
+    """DataFrame for a table given by its CSV (or .npy) path.
+
+    Uses the memory-mapped .npy if it exists and is not older than the CSV.
+    """
+    npy = path if path.endswith('.npy') else binary_path(path)
+    use_binary = os.path.exists(npy) and (
+        path == npy or not os.path.exists(path) or
+        os.path.getmtime(npy) >= os.path.getmtime(path))
+
+    if not use_binary:
+        return read_csv_typed(path, schema)
+
+    rec = np.load(npy, mmap_mode='r')
+    return pd.DataFrame({name: _widened(rec[name]) for name in rec.dtype.names})
+
+
+def _widened(col):
+    """Column upcast to int64/float64 (strings and others returned as-is)."""
+    if col.dtype.kind in 'iu':
+        return col.astype(np.int64)
+    if col.dtype.kind == 'f':
+        return col.astype(np.float64)
+    return np.asarray(col)